@@ -0,0 +1,248 @@
+"""
+Batch Scoring Pipeline
+Streams a large registry export (CSV, Excel or Parquet) through validation,
+cleaning, preprocessing and the Random Forest one chunk at a time, appending
+each scored chunk to a CSV or Parquet file. Memory stays bounded by the chunk
+size (times the number of chunks in flight when scoring in worker processes).
+
+    python batch_scoring.py province_2025.csv scored.csv
+    python batch_scoring.py province_2025.xlsx scored.parquet --chunksize 20000 --workers 4
+
+Parquet input/output needs pyarrow.
+"""
+
+import os
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from malnutrition_model import MalnutritionRandomForestModel
+from data_manager import DataManager
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'malnutrition_model')
+DEFAULT_CHUNKSIZE = 10000
+
+# Output columns, in order; every chunk is written with exactly these
+OUTPUT_COLUMNS = ['row', 'name', 'age_months', 'weight', 'height', 'whz_score', 'bmi',
+                  'prediction', 'treatment', 'validation_errors']
+NUMERIC_OUTPUT_COLUMNS = ['age_months', 'weight', 'height', 'whz_score', 'bmi']
+
+# Set in each worker process by _init_worker
+_model = None
+_data_manager = None
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet files need pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def read_chunks(input_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrames of up to chunksize rows from a CSV, Excel or Parquet file"""
+    extension = os.path.splitext(input_path)[1].lower()
+
+    if extension in ('.xlsx', '.xlsm'):
+        yield from _read_excel_chunks(input_path, chunksize)
+    elif extension == '.parquet':
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunksize)
+
+
+def _read_excel_chunks(input_path, chunksize):
+    """Stream the first worksheet row by row (openpyxl read-only mode)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(column) for column in next(rows, ())]
+        buffer = []
+
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            buffer.append(values)
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def load_scoring_model(model_path=DEFAULT_MODEL_PATH, flat_forest_only=False):
+    """
+    Trained model from an artefact directory (or legacy .pkl)
+
+    With flat_forest_only, whole chunks are scored on the memory-mapped flat
+    engine and the sklearn forest is never unpickled (less memory per worker,
+    slower scoring).
+    """
+    model = MalnutritionRandomForestModel()
+    model.load_model(model_path)
+    model.flat_forest_only = flat_forest_only
+    return model
+
+
+def score_chunk(model, data_manager, chunk, first_row=1):
+    """
+    Validate, clean and score one chunk
+
+    Returns:
+        DataFrame with OUTPUT_COLUMNS, one row per input row, in input order.
+        validation_errors lists the problems found before cleaning; those rows
+        were scored on DataManager's default values and should be reviewed.
+    """
+    chunk = chunk.reset_index(drop=True)
+    validation = data_manager.validate_data(chunk)
+
+    row_errors = {}
+    for record in validation['error_records']:
+        row_errors.setdefault(record['row'] - 1, []).append(record['message'])
+
+    scored = model.predict_batch(data_manager.validate_and_clean_data(chunk))
+    scored['row'] = np.arange(first_row, first_row + len(chunk))
+    scored['validation_errors'] = [
+        '; '.join(row_errors.get(i, [])) for i in range(len(chunk))
+    ]
+
+    return scored.reindex(columns=OUTPUT_COLUMNS)
+
+
+def _init_worker(model_path, flat_forest_only):
+    global _model, _data_manager
+    _model = load_scoring_model(model_path, flat_forest_only)
+    _data_manager = DataManager()
+
+
+def _score_chunk_in_worker(chunk, first_row):
+    return score_chunk(_model, _data_manager, chunk, first_row)
+
+
+class _ResultWriter:
+    """Appends scored chunks to a CSV or Parquet file with a fixed schema"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.parquet = output_path.lower().endswith('.parquet')
+        self._writer = None
+        self._fh = None
+
+    def write(self, results):
+        for column in NUMERIC_OUTPUT_COLUMNS:
+            results[column] = pd.to_numeric(results[column], errors='coerce')
+
+        if self.parquet:
+            pyarrow = _require_pyarrow()
+            import pyarrow.parquet as pq
+            for column in ('name', 'prediction', 'treatment', 'validation_errors'):
+                results[column] = results[column].astype('string')
+            table = pyarrow.Table.from_pandas(results, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            if self._fh is None:
+                self._fh = open(self.output_path, 'w', newline='')
+                results.to_csv(self._fh, index=False)
+            else:
+                results.to_csv(self._fh, index=False, header=False)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._fh is not None:
+            self._fh.close()
+
+
+def score_file(input_path, output_path, model_path=DEFAULT_MODEL_PATH,
+               chunksize=DEFAULT_CHUNKSIZE, workers=1, flat_forest_only=False):
+    """
+    Score every row of input_path into output_path (.csv or .parquet)
+
+    With workers > 1, chunks are scored in that many processes (each loads the
+    model once; artefact tree arrays are memory-mapped and shared) with at most
+    two chunks per worker in flight. Output order always matches the input.
+    flat_forest_only trades scoring speed for memory (see load_scoring_model).
+
+    Returns:
+        Summary dict with row counts, predicted class counts and timings
+    """
+    started = time.perf_counter()
+    writer = _ResultWriter(output_path)
+    summary = {
+        'input': input_path,
+        'output': output_path,
+        'rows': 0,
+        'chunks': 0,
+        'rows_with_validation_errors': 0,
+        'predictions': {}
+    }
+
+    def collect(results):
+        writer.write(results)
+        summary['rows'] += len(results)
+        summary['chunks'] += 1
+        summary['rows_with_validation_errors'] += int((results['validation_errors'] != '').sum())
+        for prediction, count in results['prediction'].value_counts().items():
+            summary['predictions'][prediction] = summary['predictions'].get(prediction, 0) + int(count)
+        print(f"Scored {summary['rows']} rows ({summary['chunks']} chunks, "
+              f"{time.perf_counter() - started:.1f}s)")
+
+    try:
+        first_row = 1
+        if workers <= 1:
+            model = load_scoring_model(model_path, flat_forest_only)
+            data_manager = DataManager()
+            for chunk in read_chunks(input_path, chunksize):
+                collect(score_chunk(model, data_manager, chunk, first_row))
+                first_row += len(chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(model_path, flat_forest_only)) as executor:
+                pending = deque()
+                for chunk in read_chunks(input_path, chunksize):
+                    pending.append(executor.submit(_score_chunk_in_worker, chunk, first_row))
+                    first_row += len(chunk)
+                    if len(pending) >= 2 * workers:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+    finally:
+        writer.close()
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a large registry export with the malnutrition model")
+    parser.add_argument('input', help="CSV, Excel (.xlsx) or Parquet file")
+    parser.add_argument('output', help="Results file (.csv or .parquet)")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Model artefact directory or .pkl")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=1, help="Scoring processes (default: score in this process)")
+    parser.add_argument('--flat-forest-only', action='store_true',
+                        help="Score on the memory-mapped trees only (less memory per worker, slower)")
+    args = parser.parse_args()
+
+    summary = score_file(args.input, args.output, args.model, args.chunksize, args.workers,
+                         args.flat_forest_only)
+
+    print(f"\n{summary['rows']} rows scored in {summary['seconds']}s -> {summary['output']}")
+    print(f"Rows with validation errors: {summary['rows_with_validation_errors']}")
+    for prediction, count in sorted(summary['predictions'].items()):
+        print(f"  {prediction}: {count}")
@@ -0,0 +1,303 @@
+"""
+Benchmark Suite
+Times the assessment stack on seeded synthetic data (generate_sample_data):
+the WHO z-score engine (single vs batch), preprocessing, single and batch
+prediction, assess_malnutrition, treatment planning and the API endpoints
+through an in-process ASGI client. Results are written as JSON and compared
+with a saved baseline; benchmarks whose median slows down by more than the
+threshold are reported as regressions and the run exits with status 1.
+
+    python benchmarks.py --save-baseline benchmark_baseline.json
+    python benchmarks.py --baseline benchmark_baseline.json --output benchmark_results.json
+    python benchmarks.py --only zscore --repeats 200
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+from datetime import datetime
+import numpy as np
+import sklearn
+
+from malnutrition_model import (
+    WHO_ZScoreCalculator, MalnutritionRandomForestModel, MalnutritionAssessment, generate_sample_data
+)
+from personalized_treatment_planner import PersonalizedTreatmentPlanner
+
+DEFAULT_REPEATS = 50
+WARMUP = 3
+TRAINING_ROWS = 2000
+BATCH_ROWS = 1000
+
+# A benchmark only regresses if it is also this much slower in absolute terms
+NOISE_FLOOR_MS = 0.05
+
+
+def measure(fn, repeats=DEFAULT_REPEATS, rows=1):
+    """Call fn repeatedly and summarize the wall-clock times"""
+    for _ in range(WARMUP):
+        fn()
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    timings_ms = np.array(timings) * 1000
+    median_ms = float(np.median(timings_ms))
+    return {
+        'repeats': repeats,
+        'rows': rows,
+        'median_ms': round(median_ms, 4),
+        'mean_ms': round(float(timings_ms.mean()), 4),
+        'p95_ms': round(float(np.percentile(timings_ms, 95)), 4),
+        'min_ms': round(float(timings_ms.min()), 4),
+        'rows_per_second': round(rows / (median_ms / 1000), 1) if median_ms else None
+    }
+
+
+def _patient(row):
+    """One generate_sample_data row as the dict predict_single expects"""
+    return {key: (value.item() if hasattr(value, 'item') else value) for key, value in row.items()}
+
+
+def build_context(training_rows=TRAINING_ROWS, batch_rows=BATCH_ROWS):
+    """Seeded data and a freshly trained model shared by every benchmark"""
+    print(f"Training benchmark model on {training_rows} synthetic children...")
+    model = MalnutritionRandomForestModel()
+    model.train_model(generate_sample_data(training_rows, seed=42))
+
+    batch = generate_sample_data(batch_rows, seed=7)
+    # The API and DataManager use lower-case sex labels
+    batch['sex'] = batch['sex'].str.lower()
+
+    return {
+        'model': model,
+        'batch': batch,
+        'patient': _patient(batch.iloc[0]),
+        'calculator': WHO_ZScoreCalculator(),
+        'assessment': MalnutritionAssessment(),
+        'planner': PersonalizedTreatmentPlanner()
+    }
+
+
+def core_benchmarks(context):
+    """name -> (callable, rows) for the Python-level entry points"""
+    calculator = context['calculator']
+    model = context['model']
+    batch = context['batch']
+    patient = context['patient']
+    assessment = context['assessment']
+    planner = context['planner']
+
+    weight = batch['weight'].to_numpy()
+    height = batch['height'].to_numpy()
+    age = batch['age_months'].to_numpy()
+    sex = batch['sex'].to_numpy()
+    n = len(batch)
+
+    def zscores_single():
+        for i in range(n):
+            calculator.calculate_weight_for_age_zscore(weight[i], age[i], sex[i])
+            calculator.calculate_height_for_age_zscore(height[i], age[i], sex[i])
+            calculator.calculate_bmi(weight[i], height[i])
+
+    assessed = assessment.assess_malnutrition(
+        age_months=patient['age_months'], weight_kg=patient['weight'], height_cm=patient['height'],
+        gender=patient['sex'], has_edema=patient['edema']
+    )
+    plan_inputs = dict(
+        patient_data={
+            'age_months': patient['age_months'], 'weight': patient['weight'], 'sex': patient['sex'],
+            'edema': patient['edema'], 'breastfeeding': patient['breastfeeding']
+        },
+        ml_result={
+            'prediction': assessed['primary_diagnosis'],
+            'probabilities': {assessed['primary_diagnosis']: assessed['confidence']}
+        },
+        risk_assessment={'overall': {'risk_score': assessed['risk_score'],
+                                     'risk_factors': assessed['risk_factors']}},
+        who_assessment=assessed['who_assessment']
+    )
+
+    return {
+        'zscore.single_loop': (zscores_single, n),
+        'zscore.batch': (lambda: calculator.calculate_zscores_batch(weight, height, age, sex), n),
+        'model.preprocess_data': (lambda: model.preprocess_data(batch), n),
+        'model.predict_single': (lambda: model.predict_single(patient), 1),
+        'model.predict_batch': (lambda: model.predict_batch(batch), n),
+        'assessment.assess_malnutrition': (
+            lambda: assessment.assess_malnutrition(
+                age_months=patient['age_months'], weight_kg=patient['weight'],
+                height_cm=patient['height'], gender=patient['sex'], has_edema=patient['edema']
+            ), 1
+        ),
+        'planner.generate_comprehensive_treatment_plan': (
+            lambda: planner.generate_comprehensive_treatment_plan(**plan_inputs), 1
+        )
+    }
+
+
+def _require_httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError("The API benchmarks need httpx (pip install httpx, or run with --no-api)")
+    return httpx
+
+
+def api_benchmarks(context):
+    """name -> (callable, rows) for the API endpoints, called in-process over ASGI"""
+    httpx = _require_httpx()
+    import api_server
+
+    # Score with the benchmark model rather than whatever is deployed next to the code
+    api_server.malnutrition_model.model = context['model']
+
+    loop = asyncio.new_event_loop()
+
+    # ASGITransport does not run the lifespan; run its startup self-test so
+    # /health reports (and is timed on) a real result instead of "starting"
+    loop.run_until_complete(api_server._refresh_self_test())
+    if api_server.latest_self_test is None or api_server.latest_self_test['status'] != 'healthy':
+        raise RuntimeError(f"API self-test failed: {api_server.latest_self_test}")
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api_server.app), base_url="http://localhost")
+
+    def call(method, path, **kwargs):
+        response = loop.run_until_complete(client.request(method, path, **kwargs))
+        response.raise_for_status()
+        return response
+
+    token = call('POST', '/auth/token', json={'api_key': api_server.API_KEY}).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    batch = context['batch']
+    children = [
+        {'age_months': int(row.age_months), 'weight_kg': float(row.weight), 'height_cm': float(row.height),
+         'gender': row.sex, 'has_edema': bool(row.edema)}
+        for row in batch.itertuples()
+    ]
+    indices_items = [{key: child[key] for key in ('age_months', 'weight_kg', 'height_cm', 'gender')}
+                     for child in children]
+
+    # Distinct children per call so the z-score cache misses
+    fresh = iter(
+        {**item, 'weight_kg': round(item['weight_kg'] + i * 1e-3, 3)}
+        for i in range(1, 10 ** 7) for item in indices_items
+    )
+
+    return {
+        'api.calculate_all_indices.cached': (
+            lambda: call('POST', '/calculate/all-indices', json=indices_items[0], headers=headers), 1
+        ),
+        'api.calculate_all_indices.uncached': (
+            lambda: call('POST', '/calculate/all-indices', json=next(fresh), headers=headers), 1
+        ),
+        'api.calculate_all_indices_batch': (
+            lambda: call('POST', '/calculate/all-indices/batch', json=indices_items, headers=headers),
+            len(indices_items)
+        ),
+        'api.assess_complete': (
+            lambda: call('POST', '/assess/complete', json={'child_data': children[0]}, headers=headers), 1
+        ),
+        'api.assess_batch': (
+            lambda: call('POST', '/assess/batch', json=children, headers=headers), len(children)
+        ),
+        'api.health': (lambda: call('GET', '/health'), 1)
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Benchmarks whose median got slower than baseline by more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+
+        change = result['median_ms'] / previous['median_ms'] - 1 if previous['median_ms'] else 0.0
+        result['baseline_median_ms'] = previous['median_ms']
+        result['change'] = round(change, 4)
+
+        if change > threshold and result['median_ms'] - previous['median_ms'] > NOISE_FLOOR_MS:
+            regressions.append({
+                'name': name,
+                'baseline_median_ms': previous['median_ms'],
+                'median_ms': result['median_ms'],
+                'change': round(change, 4)
+            })
+    return regressions
+
+
+def run_benchmarks(repeats=DEFAULT_REPEATS, only=None, include_api=True,
+                   training_rows=TRAINING_ROWS, batch_rows=BATCH_ROWS):
+    """Run the selected benchmarks; returns the JSON-ready report"""
+    context = build_context(training_rows, batch_rows)
+
+    benchmarks = core_benchmarks(context)
+    if include_api:
+        benchmarks.update(api_benchmarks(context))
+
+    results = {}
+    for name, (fn, rows) in benchmarks.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = measure(fn, repeats, rows)
+        print(f"{name:50s} median {results[name]['median_ms']:10.3f} ms   "
+              f"p95 {results[name]['p95_ms']:10.3f} ms")
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__
+        },
+        'settings': {'repeats': repeats, 'training_rows': training_rows, 'batch_rows': batch_rows},
+        'results': results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the malnutrition assessment stack")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="Timed calls per benchmark")
+    parser.add_argument('--only', nargs='*', help="Run benchmarks whose name contains any of these")
+    parser.add_argument('--no-api', action='store_true', help="Skip the API endpoint benchmarks")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    parser.add_argument('--training-rows', type=int, default=TRAINING_ROWS)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Median slowdown (fraction) reported as a regression")
+    parser.add_argument('--save-baseline', help="Also write the results to this baseline file")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.repeats, args.only, not args.no_api, args.training_rows, args.batch_rows)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare_with_baseline(report['results'], json.load(fh), args.threshold)
+        report['baseline'] = args.baseline
+        report['threshold'] = args.threshold
+        report['regressions'] = regressions
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as fh:
+            json.dump(report, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression['name']}: {regression['baseline_median_ms']:.3f} ms -> "
+                  f"{regression['median_ms']:.3f} ms ({regression['change']:+.0%})")
+        sys.exit(1)
@@ -5,7 +5,7 @@ Handles data validation, cleaning, and sample dataset generation
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Union
 import logging
 from datetime import datetime, date
 
@@ -56,59 +56,43 @@ class DataManager:
         whz_score = (bmi - normal_bmi_mean) / normal_bmi_sd
         return round(whz_score, 2)
         
-    def validate_data(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def validate_data(self, df: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Dict[str, Any]:
         """
         Validate data structure and content
         
+        Every rule runs as a vectorized mask over a whole column. Passing an
+        iterator of DataFrames (e.g. pd.read_csv(..., chunksize=...)) validates
+        a large file one chunk at a time; row numbers continue across chunks.
+        
         Args:
-            df: DataFrame to validate
+            df: DataFrame, or iterable of DataFrame chunks, to validate
             
         Returns:
-            Dictionary with validation results
+            Dictionary with validation results. 'errors' and 'warnings' hold the
+            messages; 'error_records' and 'warning_records' the same findings as
+            {'row', 'field', 'message'} dicts.
         """
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        total_rows = 0
+        
         try:
-            errors = []
-            warnings = []
+            error_records = []
+            warning_records = []
             missing_fields = []
             
-            # Check required fields
-            for field in self.required_fields:
-                if field not in df.columns:
-                    missing_fields.append(field)
-                    errors.append(f"Missing required field: {field}")
-            
-            # Validate data types and ranges
-            for row_number, (_, row) in enumerate(df.iterrows(), 1):
-                row_errors = []
-                
-                # Validate numeric fields
-                for field in self.numeric_fields:
-                    if field in df.columns:
-                        try:
-                            value = pd.to_numeric(row[field], errors='coerce')
-                            if pd.isna(value):
-                                row_errors.append(f"Row {row_number}: Invalid numeric value for {field}")
-                            elif field == 'age_months' and (value < 0 or value > 60):
-                                row_errors.append(f"Row {row_number}: Age must be between 0-60 months")
-                            elif field == 'weight' and (value < 0 or value > 50):
-                                warnings.append(f"Row {row_number}: Unusual weight value: {value}kg")
-                            elif field == 'height' and (value < 30 or value > 150):
-                                warnings.append(f"Row {row_number}: Unusual height value: {value}cm")
-                        except Exception as e:
-                            row_errors.append(f"Row {row_number}: Error validating {field}: {str(e)}")
+            for chunk_number, chunk in enumerate(chunks):
+                # Check required fields (every chunk of a file shares the header)
+                if chunk_number == 0:
+                    missing_fields = [field for field in self.required_fields if field not in chunk.columns]
                 
-                # Validate categorical fields
-                for field, valid_values in self.categorical_fields.items():
-                    if field in df.columns and row[field] not in valid_values:
-                        row_errors.append(f"Row {row_number}: Invalid value for {field}. Must be one of: {valid_values}")
-                
-                # Validate boolean fields
-                for field in self.boolean_fields:
-                    if field in df.columns:
-                        if not isinstance(row[field], (bool, int)) and str(row[field]).lower() not in ['true', 'false', '1', '0']:
-                            row_errors.append(f"Row {row_number}: Invalid boolean value for {field}")
-                
-                errors.extend(row_errors)
+                chunk_errors, chunk_warnings = self._validate_chunk(chunk, first_row=total_rows + 1)
+                error_records.extend(chunk_errors)
+                warning_records.extend(chunk_warnings)
+                total_rows += len(chunk)
+            
+            errors = [f"Missing required field: {field}" for field in missing_fields]
+            errors.extend(record['message'] for record in error_records)
+            warnings = [record['message'] for record in warning_records]
             
             is_valid = len(errors) == 0
             
@@ -116,9 +100,11 @@ class DataManager:
                 'valid': is_valid,
                 'errors': errors,
                 'warnings': warnings,
+                'error_records': error_records,
+                'warning_records': warning_records,
                 'missing_fields': missing_fields,
-                'total_rows': len(df),
-                'valid_rows': len(df) - len([e for e in errors if 'Row' in e])
+                'total_rows': total_rows,
+                'valid_rows': total_rows - len([e for e in errors if 'Row' in e])
             }
             
         except Exception as e:
@@ -127,11 +113,85 @@ class DataManager:
                 'valid': False,
                 'errors': [f"Validation error: {str(e)}"],
                 'warnings': [],
+                'error_records': [],
+                'warning_records': [],
                 'missing_fields': [],
-                'total_rows': len(df) if df is not None else 0,
+                'total_rows': total_rows,
                 'valid_rows': 0
             }
     
+    def _validate_chunk(self, df: pd.DataFrame, first_row: int = 1):
+        """
+        Row-level checks for one DataFrame, one column mask per rule
+        
+        Returns:
+            (error_records, warning_records), each ordered by row and then by
+            field in the order the checks run (numeric, categorical, boolean)
+        """
+        errors = []
+        warnings = []
+        
+        def emit(records, mask, position, field, message):
+            for i in np.flatnonzero(mask).tolist():
+                records.append((i, position, field, message(i, f"Row {first_row + i}")))
+        
+        position = 0
+        
+        # Validate numeric fields
+        for field in self.numeric_fields:
+            position += 1
+            if field not in df.columns:
+                continue
+            
+            column = df[field]
+            values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float)
+            invalid = np.isnan(values)
+            emit(errors, invalid, position, field,
+                 lambda i, row: f"{row}: Invalid numeric value for {field}")
+            
+            with np.errstate(invalid='ignore'):
+                if field == 'age_months':
+                    emit(errors, (values < 0) | (values > 60), position, field,
+                         lambda i, row: f"{row}: Age must be between 0-60 months")
+                elif field == 'weight':
+                    emit(warnings, (values < 0) | (values > 50), position, field,
+                         lambda i, row: f"{row}: Unusual weight value: {pd.to_numeric(column.iat[i])}kg")
+                elif field == 'height':
+                    emit(warnings, (values < 30) | (values > 150), position, field,
+                         lambda i, row: f"{row}: Unusual height value: {pd.to_numeric(column.iat[i])}cm")
+        
+        # Validate categorical fields
+        for field, valid_values in self.categorical_fields.items():
+            position += 1
+            if field in df.columns:
+                emit(errors, ~df[field].isin(valid_values).to_numpy(), position, field,
+                     lambda i, row: f"{row}: Invalid value for {field}. Must be one of: {valid_values}")
+        
+        # Validate boolean fields: bool/int values, or true/false/1/0 in any case
+        for field in self.boolean_fields:
+            position += 1
+            if field not in df.columns:
+                continue
+            
+            column = df[field]
+            if pd.api.types.is_bool_dtype(column) or pd.api.types.is_integer_dtype(column):
+                continue
+            
+            valid = column.astype(str).str.lower().isin(['true', 'false', '1', '0'])
+            if column.dtype == object:
+                valid |= column.map(lambda value: isinstance(value, (bool, int, np.bool_, np.integer)))
+            emit(errors, ~valid.to_numpy(dtype=bool), position, field,
+                 lambda i, row: f"{row}: Invalid boolean value for {field}")
+        
+        def to_records(findings):
+            findings.sort(key=lambda finding: finding[:2])
+            return [
+                {'row': first_row + i, 'field': field, 'message': message}
+                for i, _, field, message in findings
+            ]
+        
+        return to_records(errors), to_records(warnings)
+    
     def validate_and_clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Validate and clean data for assessment
@@ -260,47 +320,155 @@ class DataManager:
             logger.error(f"Error creating sample dataset: {e}")
             raise ValueError(f"Sample dataset creation failed: {str(e)}")
     
-    def get_data_statistics(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def statistics_accumulator(self) -> 'StatisticsAccumulator':
+        """Empty StatisticsAccumulator for this manager's numeric and categorical fields"""
+        return StatisticsAccumulator(self.numeric_fields, list(self.categorical_fields.keys()))
+    
+    def get_data_statistics(self, df: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Dict[str, Any]:
         """
         Get basic statistics for the dataset
         
         Args:
-            df: DataFrame to analyze
+            df: DataFrame, or iterable of DataFrame chunks, to analyze
             
         Returns:
             Dictionary with statistics
         """
         try:
-            stats = {
-                'total_records': len(df),
-                'columns': list(df.columns),
-                'missing_values': df.isnull().sum().to_dict(),
-                'data_types': df.dtypes.astype(str).to_dict()
-            }
-            
-            # Numeric field statistics
-            numeric_stats = {}
-            for field in self.numeric_fields:
-                if field in df.columns:
-                    numeric_stats[field] = {
-                        'mean': float(df[field].mean()) if not df[field].empty else 0,
-                        'std': float(df[field].std()) if not df[field].empty else 0,
-                        'min': float(df[field].min()) if not df[field].empty else 0,
-                        'max': float(df[field].max()) if not df[field].empty else 0
-                    }
-            
-            stats['numeric_statistics'] = numeric_stats
+            accumulator = self.statistics_accumulator()
+            for chunk in ([df] if isinstance(df, pd.DataFrame) else df):
+                accumulator.update(chunk)
             
-            # Categorical field distributions
-            categorical_stats = {}
-            for field in self.categorical_fields.keys():
-                if field in df.columns:
-                    categorical_stats[field] = df[field].value_counts().to_dict()
-            
-            stats['categorical_distributions'] = categorical_stats
-            
-            return stats
+            return accumulator.result()
             
         except Exception as e:
             logger.error(f"Error calculating statistics: {e}")
             return {'error': str(e)}
+
+
+class StatisticsAccumulator:
+    """
+    Mergeable dataset statistics for DataManager.get_data_statistics
+    
+    update() folds in one DataFrame chunk and merge() adds an accumulator built
+    elsewhere, e.g. in a worker process (accumulators pickle). Means and
+    variances combine with the pairwise update of Chan et al., so large
+    datasets never need to be loaded at once.
+    """
+    
+    def __init__(self, numeric_fields: List[str], categorical_fields: List[str]):
+        self.numeric_fields = list(numeric_fields)
+        self.categorical_fields = list(categorical_fields)
+        self.total_records = 0
+        self.columns = []
+        self.missing_values = {}
+        self.data_types = {}
+        # field -> [count, mean, sum of squared deviations, min, max] of the non-missing values
+        self.numeric = {}
+        # field -> {value: count}
+        self.categorical = {}
+    
+    @staticmethod
+    def _combine(a: List[float], b: List[float]) -> List[float]:
+        """Moments of the union of two disjoint samples"""
+        if a[0] == 0:
+            return list(b)
+        if b[0] == 0:
+            return list(a)
+        
+        count = a[0] + b[0]
+        delta = b[1] - a[1]
+        return [
+            count,
+            a[1] + delta * b[0] / count,
+            a[2] + b[2] + delta ** 2 * a[0] * b[0] / count,
+            min(a[3], b[3]),
+            max(a[4], b[4])
+        ]
+    
+    def _add_column(self, column: str, dtype: str):
+        if column not in self.data_types:
+            self.columns.append(column)
+            self.data_types[column] = dtype
+            self.missing_values[column] = 0
+        elif self.data_types[column] != dtype:
+            # Chunks disagree (e.g. one chunk was all blank); report the general type
+            self.data_types[column] = 'object'
+    
+    def update(self, df: pd.DataFrame) -> 'StatisticsAccumulator':
+        """Fold one DataFrame chunk into the statistics"""
+        self.total_records += len(df)
+        
+        for column, dtype in df.dtypes.astype(str).items():
+            self._add_column(column, dtype)
+        for column, count in df.isnull().sum().items():
+            self.missing_values[column] += int(count)
+        
+        for field in self.numeric_fields:
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=float)
+                values = values[~np.isnan(values)]
+                chunk = [0, 0.0, 0.0, np.inf, -np.inf]
+                if len(values):
+                    mean = values.mean()
+                    chunk = [len(values), mean, float(((values - mean) ** 2).sum()),
+                             values.min(), values.max()]
+                self.numeric[field] = self._combine(self.numeric.get(field, [0, 0.0, 0.0, np.inf, -np.inf]), chunk)
+        
+        for field in self.categorical_fields:
+            if field in df.columns:
+                counts = self.categorical.setdefault(field, {})
+                for value, count in df[field].value_counts().items():
+                    counts[value] = counts.get(value, 0) + int(count)
+        
+        return self
+    
+    def merge(self, other: 'StatisticsAccumulator') -> 'StatisticsAccumulator':
+        """Add the statistics of another accumulator (of other rows of the same dataset)"""
+        self.total_records += other.total_records
+        
+        for column in other.columns:
+            self._add_column(column, other.data_types[column])
+            self.missing_values[column] += other.missing_values[column]
+        
+        for field, moments in other.numeric.items():
+            self.numeric[field] = self._combine(self.numeric.get(field, [0, 0.0, 0.0, np.inf, -np.inf]), moments)
+        
+        for field, other_counts in other.categorical.items():
+            counts = self.categorical.setdefault(field, {})
+            for value, count in other_counts.items():
+                counts[value] = counts.get(value, 0) + count
+        
+        return self
+    
+    def result(self) -> Dict[str, Any]:
+        """Statistics in the get_data_statistics format"""
+        numeric_stats = {}
+        for field in self.numeric_fields:
+            if field not in self.numeric:
+                continue
+            
+            count, mean, m2, minimum, maximum = self.numeric[field]
+            if self.total_records == 0:
+                numeric_stats[field] = {'mean': 0, 'std': 0, 'min': 0, 'max': 0}
+            else:
+                numeric_stats[field] = {
+                    'mean': float(mean) if count else float('nan'),
+                    'std': float(np.sqrt(m2 / (count - 1))) if count > 1 else float('nan'),
+                    'min': float(minimum) if count else float('nan'),
+                    'max': float(maximum) if count else float('nan')
+                }
+        
+        categorical_stats = {
+            field: dict(sorted(counts.items(), key=lambda item: -item[1]))
+            for field, counts in self.categorical.items()
+        }
+        
+        return {
+            'total_records': self.total_records,
+            'columns': list(self.columns),
+            'missing_values': dict(self.missing_values),
+            'data_types': dict(self.data_types),
+            'numeric_statistics': numeric_stats,
+            'categorical_distributions': categorical_stats
+        }
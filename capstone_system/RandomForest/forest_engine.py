@@ -0,0 +1,125 @@
+"""
+Flat-Array Forest Engine
+Evaluates a trained RandomForestClassifier from contiguous node arrays, walking
+every tree for every row in lock-step with NumPy fancy indexing. This skips
+sklearn's per-call input validation and per-estimator dispatch, which dominate
+the cost of scoring one child.
+"""
+
+import numpy as np
+
+# Arrays that make up a compiled forest, in the order they are saved
+FLAT_FOREST_ARRAYS = ('roots', 'left', 'right', 'feature', 'threshold', 'leaf_proba')
+
+
+def flatten_forest(forest):
+    """Concatenate the sklearn node arrays of every tree; offsets[i] is tree i's first node"""
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    node_counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+
+    return {
+        'offsets': np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int64),
+        'node_counts': node_counts,
+        'children_left': np.concatenate([tree.children_left for tree in trees]),
+        'children_right': np.concatenate([tree.children_right for tree in trees]),
+        'feature': np.concatenate([tree.feature for tree in trees]),
+        'threshold': np.concatenate([tree.threshold for tree in trees]),
+        # (n_nodes, n_outputs, n_classes) -> (n_nodes, n_classes); the forest has one output
+        'value': np.concatenate([tree.value[:, 0, :] for tree in trees])
+    }
+
+
+class FlatForest:
+    """
+    Forest compiled to global node arrays
+
+    Leaves point to themselves and always branch left, so all trees can be
+    stepped max_depth times without checking which rows already reached a leaf.
+    The arrays may be read-only memory maps (see model_artefact.py).
+    """
+
+    def __init__(self, arrays, classes, max_depth):
+        self.roots = arrays['roots']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.leaf_proba = arrays['leaf_proba']
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.n_estimators = len(self.roots)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def compile(cls, tree_arrays, classes):
+        """Build the engine from flatten_forest() output"""
+        offsets = tree_arrays['offsets']
+        tree_of_node = np.repeat(np.arange(len(offsets)), tree_arrays['node_counts'])
+        node_ids = np.arange(len(tree_of_node), dtype=np.int64)
+        is_leaf = tree_arrays['children_left'] < 0
+
+        # Class distribution per leaf. sklearn >= 1.4 already stores fractions and
+        # uses them as-is; older versions store weighted counts and normalize.
+        value = np.asarray(tree_arrays['value'], dtype=np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        if np.allclose(normalizer, 1.0):
+            normalizer = np.ones_like(normalizer)
+        normalizer[normalizer == 0.0] = 1.0
+
+        arrays = {
+            'roots': offsets.astype(np.int64),
+            'left': np.where(is_leaf, node_ids, tree_arrays['children_left'] + offsets[tree_of_node]),
+            'right': np.where(is_leaf, node_ids, tree_arrays['children_right'] + offsets[tree_of_node]),
+            'feature': np.where(is_leaf, 0, tree_arrays['feature']).astype(np.int64),
+            'threshold': np.where(is_leaf, np.inf, tree_arrays['threshold']),
+            'leaf_proba': value / normalizer
+        }
+        return cls(arrays, classes, cls._max_depth(arrays))
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Compile a fitted RandomForestClassifier"""
+        return cls.compile(flatten_forest(forest), forest.classes_)
+
+    @staticmethod
+    def _max_depth(arrays):
+        """Deepest root-to-leaf path over all trees"""
+        left, right = arrays['left'], arrays['right']
+        depth = 0
+        frontier = arrays['roots']
+        while True:
+            internal = frontier[left[frontier] != frontier]
+            if len(internal) == 0:
+                return depth
+            frontier = np.concatenate([left[internal], right[internal]])
+            depth += 1
+
+    def arrays(self):
+        """The compiled arrays, keyed as in FLAT_FOREST_ARRAYS"""
+        return {name: getattr(self, name) for name in FLAT_FOREST_ARRAYS}
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_samples, n_estimators)"""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def predict_proba(self, X):
+        """Mean of the per-tree leaf class distributions, like RandomForestClassifier"""
+        return self.leaf_proba[self.apply(X)].sum(axis=1) / self.n_estimators
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def matches(self, forest, X, atol=1e-12):
+        """Check the engine reproduces forest.predict_proba on X"""
+        return (
+            list(self.classes_) == list(forest.classes_)
+            and np.allclose(self.predict_proba(X), forest.predict_proba(X), rtol=0, atol=atol)
+        )
@@ -0,0 +1,222 @@
+"""
+Hyperparameter Search
+Grid search over the Random Forest's tree count, depth and leaf size that
+records clinical accuracy (macro-F1, macro AUC, worst per-class recall) next to
+inference latency and model size, and recommends the smallest, fastest forest
+that stays within a tolerance of the best macro-F1.
+
+    python hyperparameter_search.py --samples 5000 --output search_results.json
+    python hyperparameter_search.py --data registry_export.csv --workers 4
+"""
+
+import os
+import time
+import json
+import pickle
+import argparse
+import itertools
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, f1_score, recall_score, roc_auc_score
+
+from malnutrition_model import MalnutritionRandomForestModel, generate_sample_data
+from forest_engine import FlatForest
+from data_manager import DataManager
+
+DEFAULT_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [8, 12, 15, None],
+    'min_samples_leaf': [1, 2, 5]
+}
+
+# Rows timed per latency measurement
+LATENCY_REPEATS = 200
+BATCH_ROWS = 1000
+
+# Set in each worker process by _init_worker
+_split = None
+
+
+def load_training_data(data_path=None, n_samples=2000):
+    """Registry export (CSV or Excel, cleaned by DataManager) or synthetic sample data"""
+    if data_path is None:
+        return generate_sample_data(n_samples)
+
+    if data_path.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(data_path)
+    else:
+        df = pd.read_csv(data_path)
+    return DataManager().validate_and_clean_data(df)
+
+
+def prepare_split(df):
+    """Preprocess, split and scale exactly as MalnutritionRandomForestModel.train_model does"""
+    base = MalnutritionRandomForestModel()
+    df_processed = base.preprocess_data(df, fit=True)
+    y = base.create_target_variable(df_processed)
+    feature_columns = [col for col in base.FEATURE_COLUMNS if col in df_processed.columns]
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        df_processed[feature_columns], y, test_size=0.2, random_state=42, stratify=y
+    )
+    X_train_scaled = base.scaler.fit_transform(X_train)
+    X_test_scaled = base.scaler.transform(X_test)
+
+    return X_train_scaled, X_test_scaled, np.asarray(y_train), np.asarray(y_test)
+
+
+def _init_worker(split):
+    global _split
+    _split = split
+
+
+def _evaluate_config(params):
+    """Fit one configuration and score it on the test split (runs in a worker)"""
+    X_train, X_test, y_train, y_test = _split
+    forest_params = {**MalnutritionRandomForestModel.DEFAULT_FOREST_PARAMS, **params,
+                     'oob_score': False, 'n_jobs': 1}
+
+    started = time.perf_counter()
+    forest = RandomForestClassifier(**forest_params).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    y_pred = forest.predict(X_test)
+    y_proba = forest.predict_proba(X_test)
+
+    try:
+        macro_auc = roc_auc_score(y_test, y_proba, multi_class='ovr', average='macro', labels=forest.classes_)
+    except ValueError:
+        macro_auc = None
+
+    return {
+        'params': params,
+        'macro_f1': float(f1_score(y_test, y_pred, average='macro')),
+        'macro_auc': None if macro_auc is None else float(macro_auc),
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'min_class_recall': float(recall_score(y_test, y_pred, average=None, labels=forest.classes_).min()),
+        'fit_seconds': round(fit_seconds, 3),
+        'forest': pickle.dumps(forest)
+    }
+
+
+def _percentile_ms(timings, q):
+    return round(float(np.percentile(timings, q)) * 1000, 4)
+
+
+def _serving_predict_proba(forest, flat_forest, X):
+    """Same engine choice as MalnutritionRandomForestModel._predict_proba"""
+    if len(X) <= MalnutritionRandomForestModel.FLAT_FOREST_MAX_ROWS:
+        return flat_forest.predict_proba(X)
+    return forest.predict_proba(X)
+
+
+def measure_inference(forest, X_test):
+    """Single-row and batch latency on the engines production would use for
+    those sizes (see _serving_predict_proba), and model size"""
+    flat_forest = FlatForest.from_sklearn(forest)
+    row = X_test[:1]
+
+    single = []
+    for _ in range(LATENCY_REPEATS):
+        started = time.perf_counter()
+        _serving_predict_proba(forest, flat_forest, row)
+        single.append(time.perf_counter() - started)
+
+    batch = np.resize(X_test, (BATCH_ROWS, X_test.shape[1]))
+    started = time.perf_counter()
+    _serving_predict_proba(forest, flat_forest, batch)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        'latency_single_ms_p50': _percentile_ms(single, 50),
+        'latency_single_ms_p95': _percentile_ms(single, 95),
+        f'latency_batch_{BATCH_ROWS}_ms': round(batch_seconds * 1000, 3),
+        'n_nodes': int(sum(estimator.tree_.node_count for estimator in forest.estimators_)),
+        'flat_forest_bytes': int(sum(array.nbytes for array in flat_forest.arrays().values())),
+        'pickle_bytes': len(pickle.dumps(forest))
+    }
+
+
+def recommend(results, tolerance):
+    """Fastest, then smallest, configuration within tolerance of the best macro-F1"""
+    best_f1 = max(result['macro_f1'] for result in results)
+    eligible = [result for result in results if result['macro_f1'] >= best_f1 - tolerance]
+    return min(eligible, key=lambda result: (result['latency_single_ms_p50'], result['n_nodes']))
+
+
+def run_search(df, grid=None, workers=None, tolerance=0.01):
+    """Evaluate every grid configuration; returns the JSON-ready report"""
+    grid = grid or DEFAULT_GRID
+    split = prepare_split(df)
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    print(f"Evaluating {len(configs)} configurations on {len(split[0])} training rows "
+          f"with {workers or os.cpu_count()} workers...")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(split,)) as executor:
+        for result in executor.map(_evaluate_config, configs):
+            # Latency is measured here, one configuration at a time, so workers
+            # still fitting do not skew it
+            forest = pickle.loads(result.pop('forest'))
+            result.update(measure_inference(forest, split[1]))
+            results.append(result)
+            print(f"{result['params']}: macro-F1 {result['macro_f1']:.3f}, "
+                  f"single {result['latency_single_ms_p50']:.3f} ms, {result['n_nodes']} nodes")
+
+    recommended = recommend(results, tolerance)
+    default_params = {name: MalnutritionRandomForestModel.DEFAULT_FOREST_PARAMS.get(name) for name in names}
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'training_rows': len(split[0]),
+        'test_rows': len(split[1]),
+        'grid': grid,
+        'tolerance': tolerance,
+        'results': results,
+        'default': next((result for result in results if result['params'] == default_params), None),
+        'recommended': recommended
+    }
+
+
+def _parse_grid_values(text):
+    return [None if value.lower() == 'none' else int(value) for value in text.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search Random Forest settings for accuracy vs. inference cost")
+    parser.add_argument('--data', help="Registry export (CSV/Excel); synthetic sample data if omitted")
+    parser.add_argument('--samples', type=int, default=2000, help="Synthetic sample size when --data is not given")
+    parser.add_argument('--n-estimators', default=','.join(map(str, DEFAULT_GRID['n_estimators'])))
+    parser.add_argument('--max-depth', default=','.join(map(str, DEFAULT_GRID['max_depth'])))
+    parser.add_argument('--min-samples-leaf', default=','.join(map(str, DEFAULT_GRID['min_samples_leaf'])))
+    parser.add_argument('--workers', type=int, default=None, help="Parallel fits (default: all cores)")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Accepted macro-F1 drop from the best configuration")
+    parser.add_argument('--output', default='hyperparameter_search.json')
+    args = parser.parse_args()
+
+    report = run_search(
+        load_training_data(args.data, args.samples),
+        grid={
+            'n_estimators': _parse_grid_values(args.n_estimators),
+            'max_depth': _parse_grid_values(args.max_depth),
+            'min_samples_leaf': _parse_grid_values(args.min_samples_leaf)
+        },
+        workers=args.workers,
+        tolerance=args.tolerance
+    )
+
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+
+    recommended = report['recommended']
+    print(f"\nRecommended: {recommended['params']} "
+          f"(macro-F1 {recommended['macro_f1']:.3f}, single {recommended['latency_single_ms_p50']:.3f} ms, "
+          f"{recommended['pickle_bytes'] / 1e6:.1f} MB)")
+    print(f"Results written to {args.output}")
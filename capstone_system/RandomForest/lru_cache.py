@@ -0,0 +1,128 @@
+"""
+LRU Cache
+Small thread-safe, size-bounded least-recently-used cache with hit-rate
+counters, used by the API to memoize z-score and reference lookups, plus a
+variant whose entries expire at a given time (verified JWTs)
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Mapping of at most maxsize entries; the least recently used entry is
+    evicted first. Cached values are shared between callers, so treat them
+    as read-only.
+    """
+
+    def __init__(self, maxsize=10000, name='cache'):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+
+        self.maxsize = maxsize
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Cached value for key (counting a hit or miss), or default"""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        if self.maxsize == 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, or compute() stored and returned on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Size, bounds and hit-rate counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class ExpiringLRUCache(LRUCache):
+    """
+    LRUCache whose entries also expire at a per-entry Unix timestamp; an
+    expired entry is dropped on lookup and counts as a miss
+    """
+
+    def __init__(self, maxsize=10000, name='cache', clock=time.time):
+        super().__init__(maxsize, name)
+        self.clock = clock
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Cached value for key if it has not expired, otherwise default"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and self.clock() >= entry[1]:
+                del self._entries[key]
+                self.expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, expires_at=None):
+        """Store value under key until expires_at (never expires if None)"""
+        super().put(key, (value, float('inf') if expires_at is None else expires_at))
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, or compute() -> (value, expires_at) stored on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value, expires_at = compute()
+            self.put(key, value, expires_at)
+        return value
+
+    def stats(self):
+        stats = super().stats()
+        stats['expirations'] = self.expirations
+        return stats
@@ -7,7 +7,9 @@ Now with flexible treatment protocol system
 import pandas as pd
 import numpy as np
 import os
+import time
 from datetime import datetime
+from types import MappingProxyType
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split, cross_val_score, learning_curve, validation_curve
 from sklearn.preprocessing import LabelEncoder, StandardScaler
@@ -21,171 +23,71 @@ import joblib
 import warnings
 warnings.filterwarnings('ignore')
 
+from who_reference import WHO_STANDARD_DIR, HEIGHT_STEP_CM, DAYS_PER_MONTH, get_reference_registry
+import model_artefact
+from forest_engine import FlatForest
+
 class WHO_ZScoreCalculator:
     """
     WHO Z-Score calculator for children 0-5 years
     """
     
-    def __init__(self):
-        # Load WHO reference data from Excel files
-        self.who_reference = {}
-        self.who_folder = "who_standard"
-        self._load_who_reference_data()
-        
-        # WHO 2006 Child Growth Standards – Weight-for-Height reference
-        # Source: WHO Multicentre Growth Reference Study Group (2006)
-        # Values: median weight (mean) in kg and standard deviation (sd) per height in cm.
-        # Previously this block had incorrect values that inflated medians above 80 cm,
-        # causing severe negative WHZ scores for normal children.  The data below is
-        # derived directly from the published WHO 2006 WFH tables and is correct.
-        self.fallback_who_reference = {
-            'weight_for_height': {
-                'boys': {
-                    45:  {'mean': 2.441, 'sd': 0.268},
-                    50:  {'mean': 3.272, 'sd': 0.359},
-                    55:  {'mean': 4.257, 'sd': 0.441},
-                    60:  {'mean': 5.398, 'sd': 0.516},
-                    65:  {'mean': 6.668, 'sd': 0.597},
-                    70:  {'mean': 7.985, 'sd': 0.696},
-                    75:  {'mean': 9.287, 'sd': 0.773},
-                    80:  {'mean': 10.617, 'sd': 0.845},
-                    85:  {'mean': 12.046, 'sd': 0.918},
-                    90:  {'mean': 13.534, 'sd': 1.000},
-                    95:  {'mean': 15.023, 'sd': 1.090},
-                    100: {'mean': 16.471, 'sd': 1.176},
-                    105: {'mean': 17.988, 'sd': 1.278},
-                    110: {'mean': 19.602, 'sd': 1.396},
-                    115: {'mean': 21.226, 'sd': 1.513},
-                    120: {'mean': 22.810, 'sd': 1.619},
-                },
-                'girls': {
-                    45:  {'mean': 2.428, 'sd': 0.263},
-                    50:  {'mean': 3.202, 'sd': 0.351},
-                    55:  {'mean': 4.196, 'sd': 0.435},
-                    60:  {'mean': 5.280, 'sd': 0.501},
-                    65:  {'mean': 6.549, 'sd': 0.587},
-                    70:  {'mean': 7.873, 'sd': 0.684},
-                    75:  {'mean': 9.131, 'sd': 0.751},
-                    80:  {'mean': 10.460, 'sd': 0.830},
-                    85:  {'mean': 11.967, 'sd': 0.918},
-                    90:  {'mean': 13.479, 'sd': 1.007},
-                    95:  {'mean': 14.891, 'sd': 1.092},
-                    100: {'mean': 16.284, 'sd': 1.181},
-                    105: {'mean': 17.773, 'sd': 1.289},
-                    110: {'mean': 19.430, 'sd': 1.424},
-                    115: {'mean': 21.143, 'sd': 1.574},
-                    120: {'mean': 22.794, 'sd': 1.701},
-                }
-            }
-        }
+    # Weight-for-length applies below 24 months (measured lying down) and
+    # weight-for-height from 24 months; without an age, WHO uses length below 87 cm
+    WFL_MAX_AGE_MONTHS = 24
+    WFL_MAX_LENGTH_CM = 87
+    
+    def __init__(self, who_folder=WHO_STANDARD_DIR):
+        # Reference tables live in a process-wide registry (see who_reference.py), so
+        # every calculator shares one read-only copy instead of loading its own
+        registry = get_reference_registry(who_folder)
+        self.who_folder = registry.who_folder
+        self.who_reference = registry.who_reference
+        self.fallback_who_reference = registry.fallback_who_reference
+        
+        # Dense per-sex L/M/S arrays indexed by month for the batch z-score engine
+        self.lms_arrays = registry.lms_arrays
+        
+        # Dense per-sex L/M/S arrays indexed by 0.1 cm for weight-for-length/height
+        self.height_lms_arrays = registry.height_lms_arrays
     
-    def _load_who_reference_data(self):
+    @staticmethod
+    def age_days_to_months(age_days):
+        """Convert age in days to (fractional) months, as the WHO tables do"""
+        return np.asarray(age_days, dtype=float) / DAYS_PER_MONTH
+    
+    def _lms_zscore_single(self, measurement_type, value, age_months, sex):
         """
-        Load WHO reference data from Excel files
+        One z-score from the dense L/M/S arrays with plain float arithmetic;
+        the same interpolation as _lms_zscore_batch without NumPy's per-call overhead
         """
-        import os
+        sex_key = 'boys' if sex.lower() in ['male', 'm', 'boy'] else 'girls'
+        table = self.lms_arrays.get(measurement_type, {}).get(sex_key)
+        if table is None:
+            return 0
         
-        try:
-            # Initialize the reference data structure
-            self.who_reference = {
-                'weight_for_age': {'boys': {}, 'girls': {}},
-                'height_for_age': {'boys': {}, 'girls': {}},
-                'weight_for_height': {'boys': {}, 'girls': {}}  # Keep for backward compatibility
-            }
-            
-            # Define the Excel files to load
-            excel_files = {
-                'weight_for_age': {
-                    'boys': 'wfa_boys_0-to-5-years_zscores.xlsx',
-                    'girls': 'wfa_girls_0-to-5-years_zscores.xlsx'
-                },
-                'height_for_age': {
-                    'boys': 'lhfa_boys_0-to-5-years_zscores.xlsx',
-                    'girls': 'lhfa_girls_0-to-5-years_zscores.xlsx'
-                }
-            }
-            
-            # Load each Excel file
-            for measurement_type, genders in excel_files.items():
-                for gender, filename in genders.items():
-                    file_path = os.path.join(self.who_folder, filename)
-                    
-                    if os.path.exists(file_path):
-                        try:
-                            # Read the Excel file
-                            df = pd.read_excel(file_path)
-                            
-                            # Process each row to create lookup table
-                            for _, row in df.iterrows():
-                                month = int(row['Month'])
-                                
-                                # Store the data with month as key
-                                self.who_reference[measurement_type][gender][month] = {
-                                    'L': float(row['L']),
-                                    'M': float(row['M']),  # Median
-                                    'S': float(row['S']),
-                                    'mean': float(row['M']),  # For backward compatibility
-                                    'sd': float(row['S']),    # For backward compatibility
-                                    'SD3neg': float(row['SD3neg']),
-                                    'SD2neg': float(row['SD2neg']),
-                                    'SD1neg': float(row['SD1neg']),
-                                    'SD0': float(row['SD0']),
-                                    'SD1': float(row['SD1']),
-                                    'SD2': float(row['SD2']),
-                                    'SD3': float(row['SD3'])
-                                }
-                            
-                            print(f"Successfully loaded {filename}")
-                            
-                        except Exception as e:
-                            print(f"Error loading {filename}: {e}")
-                    else:
-                        print(f"WHO reference file not found: {file_path}")
-            
-            # If no Excel files were loaded, use fallback data
-            if not any(self.who_reference[measurement_type][gender] 
-                      for measurement_type in self.who_reference 
-                      for gender in ['boys', 'girls']):
-                print("No WHO Excel files found, using fallback data")
-                self.who_reference = self.fallback_who_reference
-            
-        except Exception as e:
-            print(f"Error loading WHO reference data: {e}")
-            print("Using fallback reference data")
-            self.who_reference = self.fallback_who_reference
+        first_month, lms = table
+        position = min(max(age_months - first_month, 0), len(lms) - 1)
+        row = min(int(position), len(lms) - 2)
+        fraction = position - row
+        L, M, S = (float(lms[row, i]) * (1 - fraction) + float(lms[row + 1, i]) * fraction for i in range(3))
+        
+        if L != 0:
+            z_score = (((value / M) ** L) - 1) / (L * S)
+        else:
+            z_score = np.log(value / M) / S
+        
+        return round(z_score, 2)
     
     def calculate_weight_for_age_zscore(self, weight, age_months, sex):
         """
         Calculate Weight-for-Age Z-score using WHO standards
+        
+        age_months may be fractional (see age_days_to_months); L/M/S are
+        interpolated between the monthly reference rows.
         """
         try:
-            sex_key = 'boys' if sex.lower() in ['male', 'm', 'boy'] else 'girls'
-            
-            # Check if we have weight_for_age data
-            if 'weight_for_age' in self.who_reference and sex_key in self.who_reference['weight_for_age']:
-                age_data = self.who_reference['weight_for_age'][sex_key]
-                
-                # Find closest age in months
-                if age_months in age_data:
-                    reference = age_data[age_months]
-                else:
-                    # Find closest age
-                    closest_age = min(age_data.keys(), key=lambda x: abs(x - age_months))
-                    reference = age_data[closest_age]
-                
-                # Calculate Z-score using LMS method
-                L = reference['L']
-                M = reference['M']
-                S = reference['S']
-                
-                if L != 0:
-                    z_score = (((weight / M) ** L) - 1) / (L * S)
-                else:
-                    z_score = np.log(weight / M) / S
-                
-                return round(z_score, 2)
-            else:
-                return 0
+            return self._lms_zscore_single('weight_for_age', weight, age_months, sex)
                 
         except Exception as e:
             print(f"Error calculating Weight-for-Age Z-score: {e}")
@@ -194,35 +96,12 @@ class WHO_ZScoreCalculator:
     def calculate_height_for_age_zscore(self, height, age_months, sex):
         """
         Calculate Height-for-Age Z-score using WHO standards
+        
+        age_months may be fractional (see age_days_to_months); L/M/S are
+        interpolated between the monthly reference rows.
         """
         try:
-            sex_key = 'boys' if sex.lower() in ['male', 'm', 'boy'] else 'girls'
-            
-            # Check if we have height_for_age data
-            if 'height_for_age' in self.who_reference and sex_key in self.who_reference['height_for_age']:
-                age_data = self.who_reference['height_for_age'][sex_key]
-                
-                # Find closest age in months
-                if age_months in age_data:
-                    reference = age_data[age_months]
-                else:
-                    # Find closest age
-                    closest_age = min(age_data.keys(), key=lambda x: abs(x - age_months))
-                    reference = age_data[closest_age]
-                
-                # Calculate Z-score using LMS method
-                L = reference['L']
-                M = reference['M']
-                S = reference['S']
-                
-                if L != 0:
-                    z_score = (((height / M) ** L) - 1) / (L * S)
-                else:
-                    z_score = np.log(height / M) / S
-                
-                return round(z_score, 2)
-            else:
-                return 0
+            return self._lms_zscore_single('height_for_age', height, age_months, sex)
                 
         except Exception as e:
             print(f"Error calculating Height-for-Age Z-score: {e}")
@@ -277,7 +156,218 @@ class WHO_ZScoreCalculator:
         except Exception as e:
             print(f"Error classifying BMI status: {e}")
             return "Unknown"
-    
+
+    # ------------------------------------------------------------------
+    # Batch (vectorized) z-score engine
+    # ------------------------------------------------------------------
+
+    def _finalize_batch(self, results, *inputs):
+        """
+        Round batch results to 2 decimals like the scalar methods: missing inputs
+        give NaN, and anything the scalar path would have failed on gives 0
+        """
+        missing = np.zeros(results.shape, dtype=bool)
+        for values in inputs:
+            missing |= np.isnan(values)
+
+        return np.where(np.isfinite(results), np.round(results, 2), np.where(missing, np.nan, 0.0))
+
+    def _is_boy(self, sex):
+        """Vectorized version of the sex check used by the scalar z-score methods"""
+        sex = np.char.lower(np.atleast_1d(np.asarray(sex, dtype=str)))
+        return np.isin(sex, ['male', 'm', 'boy'])
+
+    @staticmethod
+    def _interpolate_lms(lms, position):
+        """L, M and S at fractional row positions of a dense L/M/S array (clipped to the table)"""
+        position = np.clip(position, 0, len(lms) - 1)
+        row = np.minimum(position.astype(int), len(lms) - 2)
+        fraction = (position - row)[:, None]
+        return (lms[row] * (1 - fraction) + lms[row + 1] * fraction).T
+
+    @staticmethod
+    def _lms_zscore(values, L, M, S):
+        """LMS z-score; callers silence NumPy floating point warnings"""
+        safe_L = np.where(L != 0, L, 1.0)
+        return np.where(L != 0, (np.power(values / M, safe_L) - 1) / (safe_L * S), np.log(values / M) / S)
+
+    def _lms_zscore_batch(self, measurement_type, values, age_months, is_boy):
+        """
+        Calculate LMS z-scores for arrays of measurements against one indicator.
+        L/M/S are interpolated linearly between the monthly reference rows, so
+        fractional ages (e.g. from age in days) are exact and whole months give
+        the tabulated values. Rounded to 2 decimals, and 0 wherever the
+        calculation fails.
+        """
+        values, age_months, is_boy = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(values, dtype=float)),
+            np.atleast_1d(np.asarray(age_months, dtype=float)),
+            is_boy
+        )
+        z_scores = np.zeros(values.shape)
+
+        tables = self.lms_arrays.get(measurement_type, {})
+        for gender, mask in (('boys', is_boy), ('girls', ~is_boy)):
+            mask = mask & np.isfinite(age_months)
+            if gender not in tables or not mask.any():
+                continue
+
+            first_month, lms = tables[gender]
+            L, M, S = self._interpolate_lms(lms, age_months[mask] - first_month)
+
+            with np.errstate(all='ignore'):
+                z_scores[mask] = self._lms_zscore(values[mask], L, M, S)
+
+        return self._finalize_batch(z_scores, values)
+
+    def calculate_weight_for_age_zscores(self, weight, age_months, sex):
+        """
+        Calculate Weight-for-Age Z-scores for arrays of children
+        """
+        return self._lms_zscore_batch('weight_for_age', weight, age_months, self._is_boy(sex))
+
+    def calculate_height_for_age_zscores(self, height, age_months, sex):
+        """
+        Calculate Height-for-Age Z-scores for arrays of children
+        """
+        return self._lms_zscore_batch('height_for_age', height, age_months, self._is_boy(sex))
+
+    @staticmethod
+    def _lms_measurement(L, M, S, z):
+        """Measurement at z-score z for the given L/M/S (inverse of the LMS z-score)"""
+        safe_L = np.where(L != 0, L, 1.0)
+        return np.where(L != 0, M * np.power(1 + safe_L * S * z, 1 / safe_L), M * np.exp(S * z))
+
+    def calculate_weight_for_height_zscores(self, weight, height, sex, age_months=None):
+        """
+        Calculate Weight-for-Length/Height Z-scores for arrays of children
+
+        Uses the WHO weight-for-length table below WFL_MAX_AGE_MONTHS and the
+        weight-for-height table from then on (by WFL_MAX_LENGTH_CM when the age is
+        unknown). L/M/S are interpolated between the 0.1 cm rows, heights outside a
+        table take its first or last row, and z-scores beyond +/-3 are adjusted as
+        in the WHO Anthro software. A missing height gives 0, a missing weight NaN.
+        """
+        weight, height, age_months, is_boy = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(weight, dtype=float)),
+            np.atleast_1d(np.asarray(height, dtype=float)),
+            np.atleast_1d(np.asarray(np.nan if age_months is None else age_months, dtype=float)),
+            self._is_boy(sex)
+        )
+
+        if not all(self.height_lms_arrays.get(measurement_type)
+                   for measurement_type in ('weight_for_length', 'weight_for_height')):
+            return self._fallback_weight_for_height_zscores(weight, height, is_boy)
+
+        use_length = np.where(
+            np.isnan(age_months), height < self.WFL_MAX_LENGTH_CM, age_months < self.WFL_MAX_AGE_MONTHS
+        )
+        z_scores = np.zeros(weight.shape)
+
+        for measurement_type, table_mask in (('weight_for_length', use_length),
+                                             ('weight_for_height', ~use_length)):
+            tables = self.height_lms_arrays[measurement_type]
+            for gender, sex_mask in (('boys', is_boy), ('girls', ~is_boy)):
+                mask = table_mask & sex_mask & np.isfinite(height)
+                if gender not in tables or not mask.any():
+                    continue
+
+                first_length, lms = tables[gender]
+                L, M, S = self._interpolate_lms(lms, (height[mask] - first_length) / HEIGHT_STEP_CM)
+
+                with np.errstate(all='ignore'):
+                    y = weight[mask]
+                    z = self._lms_zscore(y, L, M, S)
+
+                    # Beyond +/-3 SD, distances are measured in units of the 2-3 SD band
+                    sd3pos, sd2pos = self._lms_measurement(L, M, S, 3), self._lms_measurement(L, M, S, 2)
+                    sd3neg, sd2neg = self._lms_measurement(L, M, S, -3), self._lms_measurement(L, M, S, -2)
+                    z = np.where(z > 3, 3 + (y - sd3pos) / (sd3pos - sd2pos), z)
+                    z = np.where(z < -3, -3 + (y - sd3neg) / (sd2neg - sd3neg), z)
+
+                z_scores[mask] = z
+
+        return np.where(np.isnan(height), 0.0, self._finalize_batch(z_scores, weight))
+
+    def _fallback_weight_for_height_zscores(self, weight, height, is_boy):
+        """
+        Mean/SD weight-for-height z-scores from the 5 cm fallback table, used when
+        the WHO length/height Excel files are not available
+        """
+        z_scores = np.zeros(weight.shape)
+        for gender, mask in (('boys', is_boy), ('girls', ~is_boy)):
+            reference_data = self.fallback_who_reference['weight_for_height'][gender]
+            available_heights = np.array(list(reference_data.keys()), dtype=float)
+            means = np.array([ref['mean'] for ref in reference_data.values()])
+            sds = np.array([ref['sd'] for ref in reference_data.values()])
+            
+            # np.rint rounds half to even like round(); argmin takes the first closest height
+            height_rounded = np.rint(height[mask])
+            closest = np.abs(height_rounded[:, None] - available_heights[None, :]).argmin(axis=1)
+            z_scores[mask] = (weight[mask] - means[closest]) / sds[closest]
+        
+        # A missing height fails the scalar lookup (0); a missing weight propagates NaN
+        z_scores = np.round(z_scores, 2)
+        return np.where(np.isnan(height), 0.0, z_scores)
+
+    def calculate_bmi_batch(self, weight, height):
+        """
+        Calculate BMI for arrays of weights (kg) and heights (cm)
+        """
+        weight, height = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(weight, dtype=float)),
+            np.atleast_1d(np.asarray(height, dtype=float))
+        )
+
+        with np.errstate(all='ignore'):
+            bmi = weight / ((height / 100) ** 2)
+
+        return self._finalize_batch(bmi, weight, height)
+
+    def classify_bmi_status_batch(self, bmi, age_months):
+        """
+        Classify BMI status for arrays of children (same thresholds as classify_bmi_status)
+        """
+        bmi, age_months = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(bmi, dtype=float)),
+            np.atleast_1d(np.asarray(age_months, dtype=float))
+        )
+        under_2 = age_months < 24
+
+        # Thresholds per band: (severely underweight <, underweight <, normal <=, overweight <=)
+        severe = np.where(under_2, 13, 13.5)
+        underweight = np.where(under_2, 15, 15.5)
+        normal = np.where(under_2, 18, 17.5)
+        overweight = np.where(under_2, 20, 19.5)
+
+        return np.select(
+            [bmi < severe, bmi < underweight, bmi <= normal, bmi <= overweight],
+            ["Severely Underweight", "Underweight", "Normal", "Overweight"],
+            default="Obese"
+        ).astype(object)
+
+    def calculate_zscores_batch(self, weight, height, age_months, sex):
+        """
+        Calculate WFA/HFA z-scores and BMI for whole arrays of children at once
+
+        Args:
+            weight: Array-like of weights in kg
+            height: Array-like of heights in cm
+            age_months: Array-like of ages in months
+            sex: Array-like of sex labels ('male'/'female', 'm'/'f', 'boy'/'girl')
+
+        Returns:
+            Dict of NumPy arrays keyed 'weight_for_age', 'height_for_age' and 'bmi'.
+            BMI is returned as a value because no BMI-for-age LMS table is loaded.
+        """
+        is_boy = self._is_boy(sex)
+
+        return {
+            'weight_for_age': self._lms_zscore_batch('weight_for_age', weight, age_months, is_boy),
+            'height_for_age': self._lms_zscore_batch('height_for_age', height, age_months, is_boy),
+            'bmi': self.calculate_bmi_batch(weight, height)
+        }
+
     def classify_nutritional_status(self, wfa_zscore, hfa_zscore, bmi, age_months, has_edema=False):
         """
         Classify nutritional status based on multiple indicators.
@@ -423,41 +513,84 @@ class WHO_ZScoreCalculator:
             wfa_zscore = self.calculate_weight_for_age_zscore(weight, age_months, sex)
             hfa_zscore = self.calculate_height_for_age_zscore(height, age_months, sex)
             bmi = self.calculate_bmi(weight, height)
-            bmi_status = self.classify_bmi_status(bmi, age_months)
             
-            # Classify nutritional status
-            nutritional_status = self.classify_nutritional_status(
-                wfa_zscore, hfa_zscore, bmi, age_months, has_edema
+            return self._build_comprehensive_assessment(
+                weight, height, age_months, sex, has_edema, wfa_zscore, hfa_zscore, bmi
             )
             
-            # Calculate confidence score
-            confidence_data = self.calculate_confidence_score(
-                weight, height, age_months, sex, wfa_zscore, hfa_zscore, bmi
-            )
-            
-            return {
-                'measurements': {
-                    'weight': weight,
-                    'height': height,
-                    'age_months': age_months,
-                    'sex': sex,
-                    'bmi': bmi
-                },
-                'z_scores': {
-                    'weight_for_age': wfa_zscore,
-                    'height_for_age': hfa_zscore
-                },
-                'classifications': {
-                    'bmi_status': bmi_status,
-                    'nutritional_status': nutritional_status
-                },
-                'confidence': confidence_data,
-                'has_edema': has_edema
-            }
-            
         except Exception as e:
             print(f"Error in comprehensive assessment: {e}")
             return None
+    
+    def comprehensive_assessment_batch(self, weight, height, age_months, sex, has_edema=None):
+        """
+        Perform comprehensive assessments for lists of children
+        
+        Z-scores and BMI for the whole list are computed in one vectorized pass;
+        one result dict (or None on error) is returned per child, in input order.
+        """
+        if has_edema is None:
+            has_edema = [False] * len(weight)
+        
+        z_scores = self.calculate_zscores_batch(weight, height, age_months, sex)
+        
+        results = []
+        for i in range(len(weight)):
+            try:
+                results.append(self._build_comprehensive_assessment(
+                    weight[i], height[i], age_months[i], sex[i], has_edema[i],
+                    float(z_scores['weight_for_age'][i]),
+                    float(z_scores['height_for_age'][i]),
+                    float(z_scores['bmi'][i])
+                ))
+            except Exception as e:
+                print(f"Error in comprehensive assessment: {e}")
+                results.append(None)
+        
+        return results
+    
+    def _build_comprehensive_assessment(self, weight, height, age_months, sex, has_edema,
+                                        wfa_zscore, hfa_zscore, bmi):
+        """
+        Classify and score one child's assessment from precomputed indicators
+        """
+        bmi_status = self.classify_bmi_status(bmi, age_months)
+        
+        # Classify nutritional status
+        nutritional_status = self.classify_nutritional_status(
+            wfa_zscore, hfa_zscore, bmi, age_months, has_edema
+        )
+        
+        # Calculate confidence score
+        confidence_data = self.calculate_confidence_score(
+            weight, height, age_months, sex, wfa_zscore, hfa_zscore, bmi
+        )
+        
+        return {
+            'measurements': {
+                'weight': weight,
+                'height': height,
+                'age_months': age_months,
+                'sex': sex,
+                'bmi': bmi
+            },
+            'z_scores': {
+                'weight_for_age': wfa_zscore,
+                'height_for_age': hfa_zscore
+            },
+            'classifications': {
+                'bmi_status': bmi_status,
+                'nutritional_status': nutritional_status
+            },
+            'confidence': confidence_data,
+            'has_edema': has_edema
+        }
+
+def _freeze_category_map(classes):
+    """Read-only value -> code map in LabelEncoder order"""
+    return MappingProxyType({str(value): code for code, value in enumerate(classes)})
+
+_EMPTY_CATEGORY_MAP = _freeze_category_map([])
 
 class MalnutritionRandomForestModel:
     """
@@ -465,64 +598,90 @@ class MalnutritionRandomForestModel:
     Now includes flexible treatment protocol system
     """
     
-    def __init__(self, protocol_name='who_standard'):
-        self.model = RandomForestClassifier(
-            n_estimators=200,
-            random_state=42,
-            max_depth=15,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            class_weight='balanced',  # corrects imbalance across all 5 classes
-            oob_score=True  # Enable OOB scoring for evaluation
-        )
+    # The flat engine wins on small inputs where sklearn's fixed per-call cost
+    # dominates; sklearn's compiled traversal is faster for large batches
+    FLAT_FOREST_MAX_ROWS = 256
+    
+    # Forest settings; hyperparameter_search.py explores alternatives
+    DEFAULT_FOREST_PARAMS = {
+        'n_estimators': 200,
+        'random_state': 42,
+        'max_depth': 15,
+        'min_samples_split': 5,
+        'min_samples_leaf': 2,
+        'class_weight': 'balanced',  # corrects imbalance across all 5 classes
+        'oob_score': True  # Enable OOB scoring for evaluation
+    }
+    
+    # Model inputs, in order; train_model keeps the ones present in the data
+    FEATURE_COLUMNS = ['age_months', 'weight', 'height', 'bmi', 'whz_score', 'wfa_zscore', 'hfa_zscore',
+                       'total_household', 'adults', 'children', 'twins',
+                       'sex', '4ps_beneficiary', 'breastfeeding',
+                       'tuberculosis', 'malaria', 'congenital_anomalies',
+                       'other_medical_problems', 'age_group', 'bmi_status']
+    
+    def __init__(self, protocol_name='who_standard', forest_params=None):
+        self.model = RandomForestClassifier(**{**self.DEFAULT_FOREST_PARAMS, **(forest_params or {})})
         self.label_encoders = {}
+        self.category_maps = {}
         self.scaler = StandardScaler()
         self.who_calculator = WHO_ZScoreCalculator()
         self.is_trained = False
         self.feature_columns = []
         self.evaluation_results = {}
+        self.manifest = None
+        self.flat_forest = None
+        # Opt-in: score large batches on the flat engine in FLAT_FOREST_MAX_ROWS
+        # blocks (slower) so the sklearn forest is never unpickled in this process
+        self.flat_forest_only = False
+        self._evaluation_data = None
+        self._n_jobs = None
+        self.lineage = []
         
         print(f"Initialized with protocol: {protocol_name}")
         self.current_protocol = protocol_name
+    
+    @property
+    def model(self):
+        """The sklearn forest; loaded from the artefact on first use"""
+        if self._model is None and self._model_loader is not None:
+            self._model = self._model_loader()
+            self._model_loader = None
+        return self._model
+    
+    @model.setter
+    def model(self, value):
+        self._model = value
+        self._model_loader = None
         
-    def preprocess_data(self, df):
+    def preprocess_data(self, df, fit=False):
         """
         Preprocess the input data
+        
+        With fit=True (training only) the categorical encoders are fitted from
+        df and frozen; otherwise the frozen maps are only read.
         """
         df_processed = df.copy()
         
-        # Calculate BMI
-        df_processed['bmi'] = df_processed.apply(
-            lambda row: self.who_calculator.calculate_bmi(
-                row['weight'], row['height']
-            ), axis=1
-        )
+        # Derived anthropometric features, computed column-wise for the whole frame
+        weight = df_processed['weight'].to_numpy(dtype=float)
+        height = df_processed['height'].to_numpy(dtype=float)
+        age_months = df_processed['age_months'].to_numpy(dtype=float)
+        sex = df_processed['sex'].to_numpy()
         
-        # Calculate WHZ score (Weight-for-Height Z-score)
-        df_processed['whz_score'] = df_processed.apply(
-            lambda row: self._calculate_whz_score(
-                row['weight'], row['height'], row['sex']
-            ), axis=1
-        )
+        z_scores = self.who_calculator.calculate_zscores_batch(weight, height, age_months, sex)
         
-        # Calculate WFA and HFA Z-scores
-        df_processed['wfa_zscore'] = df_processed.apply(
-            lambda row: self.who_calculator.calculate_weight_for_age_zscore(
-                row['weight'], row['age_months'], row['sex']
-            ), axis=1
-        )
+        # BMI and WHZ score (Weight-for-Height Z-score)
+        df_processed['bmi'] = z_scores['bmi']
+        df_processed['whz_score'] = self._calculate_whz_scores_batch(weight, height, sex, age_months)
         
-        df_processed['hfa_zscore'] = df_processed.apply(
-            lambda row: self.who_calculator.calculate_height_for_age_zscore(
-                row['height'], row['age_months'], row['sex']
-            ), axis=1
-        )
+        # WFA and HFA Z-scores
+        df_processed['wfa_zscore'] = z_scores['weight_for_age']
+        df_processed['hfa_zscore'] = z_scores['height_for_age']
         
-        # Calculate BMI status
-        df_processed['bmi_status'] = df_processed.apply(
-            lambda row: self.who_calculator.classify_bmi_status(
-                row['bmi'], row['age_months']
-            ), axis=1
+        # BMI status
+        df_processed['bmi_status'] = self.who_calculator.classify_bmi_status_batch(
+            z_scores['bmi'], age_months
         )
         
         # Create age groups
@@ -537,54 +696,60 @@ class MalnutritionRandomForestModel:
                              'tuberculosis', 'malaria', 'congenital_anomalies', 'other_medical_problems',
                              'age_group', 'bmi_status']
         
+        if fit:
+            self.label_encoders = {}
+            self.category_maps = {}
+        
         for col in categorical_columns:
             if col in df_processed.columns:
-                if col not in self.label_encoders:
-                    self.label_encoders[col] = LabelEncoder()
-                    df_processed[col] = self.label_encoders[col].fit_transform(df_processed[col].astype(str))
-                else:
-                    # Handle new categories during prediction
-                    unique_values = set(df_processed[col].astype(str))
-                    known_values = set(self.label_encoders[col].classes_)
-                    new_values = unique_values - known_values
-                    
-                    if new_values:
-                        # Add new values to encoder
-                        all_values = list(known_values) + list(new_values)
-                        self.label_encoders[col].classes_ = np.array(all_values)
-                    
-                    df_processed[col] = self.label_encoders[col].transform(df_processed[col].astype(str))
+                values = df_processed[col].astype(str).to_numpy()
+                
+                if fit:
+                    self.label_encoders[col] = LabelEncoder().fit(values)
+                    self.category_maps[col] = _freeze_category_map(self.label_encoders[col].classes_)
+                
+                df_processed[col] = self._encode_categories(col, values)
         
         return df_processed
     
-    def _calculate_whz_score(self, weight, height, sex):
+    def _encode_categories(self, col, values):
+        """
+        Codes of a categorical column from its frozen map
+        
+        Known values get their LabelEncoder code; values never seen in training
+        all share the unknown code, len(classes), as does every value of a
+        column the model was not trained on. Nothing is learned at prediction
+        time, so a shared model is safe to use from many threads.
+        """
+        category_map = self.category_maps.get(col, _EMPTY_CATEGORY_MAP)
+        unknown = len(category_map)
+        return np.fromiter((category_map.get(value, unknown) for value in values),
+                           dtype=np.int64, count=len(values))
+    
+    def _freeze_categories(self):
+        """Rebuild the frozen category maps from the fitted label encoders"""
+        self.category_maps = {
+            col: _freeze_category_map(encoder.classes_)
+            for col, encoder in self.label_encoders.items()
+        }
+    
+    def _calculate_whz_score(self, weight, height, sex, age_months=None):
         """
-        Calculate Weight-for-Height Z-score using WHO standards
+        Calculate Weight-for-Length/Height Z-score using WHO standards
         """
         try:
-            # Use the fallback reference data for WHZ calculation
-            gender = 'boys' if sex.lower() in ['male', 'm'] else 'girls'
-            height_rounded = round(height)
-            
-            # Find closest height in reference data
-            reference_data = self.who_calculator.fallback_who_reference['weight_for_height'][gender]
-            available_heights = list(reference_data.keys())
-            
-            if height_rounded in available_heights:
-                ref = reference_data[height_rounded]
-            else:
-                # Find closest height
-                closest_height = min(available_heights, key=lambda x: abs(x - height_rounded))
-                ref = reference_data[closest_height]
-            
-            # Calculate z-score: (observed - mean) / sd
-            z_score = (weight - ref['mean']) / ref['sd']
-            return round(z_score, 2)
+            return float(self._calculate_whz_scores_batch(weight, height, sex, age_months)[0])
             
         except Exception as e:
             print(f"Error calculating WHZ score: {e}")
             return 0
     
+    def _calculate_whz_scores_batch(self, weight, height, sex, age_months=None):
+        """
+        Vectorized WHZ for arrays of children (see calculate_weight_for_height_zscores)
+        """
+        return self.who_calculator.calculate_weight_for_height_zscores(weight, height, sex, age_months)
+    
     def create_target_variable(self, df):
         """
         Create target variable based on WHZ score, BMI status and clinical assessment.
@@ -625,25 +790,38 @@ class MalnutritionRandomForestModel:
 
         return df.apply(classify_status, axis=1)
     
-    def train_model(self, df):
+    def train_model(self, df, n_jobs=-1, generate_plots=False):
         """
         Train the Random Forest model with comprehensive evaluation
+        
+        Args:
+            df: Training data
+            n_jobs: Cores used for fitting, cross-validation and plots (-1 = all).
+                    Results do not depend on it: the forest's random_state fixes
+                    every tree's seed up front.
+            generate_plots: Also render the evaluation plots; they can be made
+                            later with generate_evaluation_plots()
+        
+        Wall-clock time per stage is stored in evaluation_results['stage_timings'].
         """
+        stage_timings = {}
+        stage_started = time.perf_counter()
+        
+        def end_stage(name):
+            nonlocal stage_started
+            now = time.perf_counter()
+            stage_timings[name] = round(now - stage_started, 3)
+            stage_started = now
+        
         # Preprocess data
-        df_processed = self.preprocess_data(df)
+        df_processed = self.preprocess_data(df, fit=True)
         
         # Create target variable
         y = self.create_target_variable(df_processed)
+        end_stage('preprocess')
         
-        # Select features for training
-        feature_columns = ['age_months', 'weight', 'height', 'bmi', 'whz_score', 'wfa_zscore', 'hfa_zscore',
-                          'total_household', 'adults', 'children', 'twins',
-                          'sex', '4ps_beneficiary', 'breastfeeding',
-                          'tuberculosis', 'malaria', 'congenital_anomalies',
-                          'other_medical_problems', 'age_group', 'bmi_status']
-        
-        # Filter available columns
-        available_columns = [col for col in feature_columns if col in df_processed.columns]
+        # Select features for training (filter available columns)
+        available_columns = [col for col in self.FEATURE_COLUMNS if col in df_processed.columns]
         X = df_processed[available_columns]
         
         self.feature_columns = available_columns
@@ -656,11 +834,25 @@ class MalnutritionRandomForestModel:
         # Scale features
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
+        end_stage('split_and_scale')
         
-        # Train model
+        # Train model on all requested cores; prediction stays single-threaded,
+        # where joblib dispatch would only add latency
         print("Training Random Forest model...")
+        prediction_n_jobs = self.model.n_jobs
+        self.model.set_params(n_jobs=n_jobs)
         self.model.fit(X_train_scaled, y_train)
         self.is_trained = True
+        self.lineage = [{
+            'type': 'full_training',
+            'n_trees': len(self.model.estimators_),
+            'n_samples': len(X_train_scaled),
+            'trained_at': datetime.now().isoformat()
+        }]
+        end_stage('fit')
+        
+        self.compile_flat_forest(verify_X=X_test_scaled)
+        end_stage('compile_flat_forest')
         
         # Make predictions
         y_pred = self.model.predict(X_test_scaled)
@@ -688,10 +880,14 @@ class MalnutritionRandomForestModel:
         print(f"├── Max Depth: {getattr(self.model, 'max_depth', 'Unknown')}")
         print(f"└── Features Used: {len(self.feature_columns)}")
         
-        # 3. Cross-Validation
+        end_stage('evaluate')
+        
+        # 3. Cross-Validation (folds run one after another, each fit on all cores)
         cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5, scoring='accuracy')
         cv_std = cv_scores.std()
         cv_mean = cv_scores.mean()
+        self.model.set_params(n_jobs=prediction_n_jobs)
+        end_stage('cross_validation')
         
         print(f"\n🔄 CROSS-VALIDATION RESULTS:")
         print(f"├── CV Mean Score: {cv_mean:.3f} {'✅' if cv_mean > 0.85 else '⚠️'}")
@@ -699,8 +895,9 @@ class MalnutritionRandomForestModel:
         print(f"├── Training-Validation Gap: {abs(accuracy - cv_mean):.3f} {'✅' if abs(accuracy - cv_mean) < 0.05 else '⚠️'}")
         print(f"└── CV Scores: {[f'{score:.3f}' for score in cv_scores]}")
         
-        # 4. Generate comprehensive plots
-        self._generate_evaluation_plots(X_train_scaled, X_test_scaled, y_train, y_test, y_pred, y_pred_proba)
+        # Kept for generate_evaluation_plots()
+        self._evaluation_data = (X_train_scaled, X_test_scaled, y_train, y_test, y_pred, y_pred_proba)
+        self._n_jobs = n_jobs
         
         # Store evaluation results
         self.evaluation_results = {
@@ -711,7 +908,8 @@ class MalnutritionRandomForestModel:
             'oob_score': self.model.oob_score_,
             'cv_mean': cv_mean,
             'cv_std': cv_std,
-            'training_validation_gap': abs(accuracy - cv_mean)
+            'training_validation_gap': abs(accuracy - cv_mean),
+            'stage_timings': stage_timings
         }
         
         # Print detailed classification report
@@ -724,9 +922,108 @@ class MalnutritionRandomForestModel:
             print(f"\n📊 MULTI-CLASS AUC (One-vs-Rest, Macro): {macro_auc:.3f} {'✅' if macro_auc > 0.95 else '⚠️'}")
         except Exception:
             pass
+        end_stage('report')
+        
+        # 4. Generate comprehensive plots (opt-in)
+        if generate_plots:
+            self.generate_evaluation_plots()
+        
+        print(f"\n⏱️ STAGE TIMINGS (n_jobs={n_jobs}):")
+        for stage, seconds in stage_timings.items():
+            print(f"├── {stage}: {seconds:.3f}s")
+        print(f"└── total: {sum(stage_timings.values()):.3f}s")
 
         return X_test, y_test, y_pred
     
+    def generate_evaluation_plots(self):
+        """
+        Render the evaluation plots for the last train_model() run
+        """
+        if self._evaluation_data is None:
+            raise ValueError("No evaluation data; call train_model() first")
+        
+        started = time.perf_counter()
+        self._generate_evaluation_plots(*self._evaluation_data)
+        self.evaluation_results.setdefault('stage_timings', {})['plots'] = round(time.perf_counter() - started, 3)
+    
+    def update_model(self, new_df, n_new_trees=50, n_jobs=-1, artefact_dir=None, model_version=None):
+        """
+        Add trees trained only on newly accumulated assessments (warm start)
+        
+        The existing trees are kept, and the scaler and categorical maps stay
+        frozen so old and new trees see the same feature space; categories not
+        seen in the original training get the unknown code. Cost grows with
+        new_df, not with the full registry.
+        
+        Args:
+            new_df: Assessments collected since the last (re)training
+            n_new_trees: Trees to add
+            n_jobs: Cores used for fitting the new trees
+            artefact_dir: If given, save the updated model there as a new artefact
+            model_version: Version for that artefact (default: timestamp)
+            
+        Returns:
+            Summary dict with the pre-update accuracy on new_df, tree counts,
+            timing and the new model version (if saved)
+        """
+        if not self.is_trained:
+            raise ValueError("update_model needs a trained or loaded model")
+        
+        started = time.perf_counter()
+        
+        df_processed = self.preprocess_data(new_df)
+        y_new = np.asarray(self.create_target_variable(df_processed))
+        X_new = self.scaler.transform(df_processed[self.feature_columns])
+        
+        # sklearn recomputes classes_ from y on every fit, so the new batch must
+        # contain exactly the classes the existing trees vote over
+        known_classes = set(self._classes())
+        new_classes = set(y_new)
+        if new_classes != known_classes:
+            raise ValueError(
+                f"New data must cover the model's classes {sorted(known_classes)}; "
+                f"missing {sorted(known_classes - new_classes)}, unknown {sorted(new_classes - known_classes)}"
+            )
+        
+        accuracy_before = accuracy_score(y_new, self._classes()[np.argmax(self._predict_proba(X_new), axis=1)])
+        
+        forest = self.model
+        parent_version = self.manifest['model_version'] if self.manifest else None
+        n_trees_before = len(forest.estimators_)
+        previous_params = {key: forest.get_params()[key] for key in ('warm_start', 'n_estimators', 'n_jobs', 'oob_score')}
+        
+        # OOB estimates are meaningless across batches, so they are skipped here
+        forest.set_params(warm_start=True, n_estimators=n_trees_before + n_new_trees,
+                          n_jobs=n_jobs, oob_score=False)
+        forest.fit(X_new, y_new)
+        forest.set_params(warm_start=False, n_jobs=previous_params['n_jobs'],
+                          oob_score=previous_params['oob_score'])
+        
+        self.compile_flat_forest()
+        self.lineage.append({
+            'type': 'warm_start',
+            'parent_version': parent_version,
+            'n_new_trees': n_new_trees,
+            'n_samples': len(X_new),
+            'trained_at': datetime.now().isoformat()
+        })
+        
+        summary = {
+            'accuracy_before_update': float(accuracy_before),
+            'n_samples': len(X_new),
+            'n_trees_before': n_trees_before,
+            'n_trees_after': len(forest.estimators_),
+            'parent_version': parent_version,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        
+        if artefact_dir is not None:
+            summary['model_version'] = self.save_artefact(artefact_dir, model_version=model_version)['model_version']
+        
+        print(f"🌱 Added {n_new_trees} trees on {len(X_new)} new samples in {summary['seconds']:.3f}s "
+              f"(accuracy on new data before update: {accuracy_before:.3f})")
+        return summary
+    
     def _generate_evaluation_plots(self, X_train, X_test, y_train, y_test, y_pred, y_pred_proba):
         """
         Generate comprehensive evaluation plots for Random Forest model
@@ -750,7 +1047,8 @@ class MalnutritionRandomForestModel:
         # 2. Permutation Importance
         plt.subplot(3, 3, 2)
         try:
-            perm_importance = permutation_importance(self.model, X_test, y_test, n_repeats=10, random_state=42)
+            perm_importance = permutation_importance(self.model, X_test, y_test, n_repeats=10, random_state=42,
+                                                     n_jobs=self._n_jobs)
             perm_df = pd.DataFrame({
                 'feature': self.feature_columns,
                 'importance': getattr(perm_importance, 'importances_mean', np.zeros(len(self.feature_columns)))
@@ -770,7 +1068,8 @@ class MalnutritionRandomForestModel:
         oob_errors = []
         tree_range = range(10, 201, 10)
         for n_trees in tree_range:
-            temp_model = RandomForestClassifier(n_estimators=n_trees, oob_score=True, random_state=42)
+            temp_model = RandomForestClassifier(n_estimators=n_trees, oob_score=True, random_state=42,
+                                                n_jobs=self._n_jobs)
             temp_model.fit(X_train, y_train)
             oob_errors.append(1 - temp_model.oob_score_)
         
@@ -786,7 +1085,7 @@ class MalnutritionRandomForestModel:
             learning_curve_result = learning_curve(
                 self.model, X_train, y_train, cv=5, 
                 train_sizes=np.linspace(0.1, 1.0, 10),
-                scoring='accuracy'
+                scoring='accuracy', n_jobs=self._n_jobs
             )
             train_sizes, train_scores, val_scores = learning_curve_result[0], learning_curve_result[1], learning_curve_result[2]
             
@@ -946,6 +1245,45 @@ class MalnutritionRandomForestModel:
         
         return feature_importance
     
+    def compile_flat_forest(self, verify_X=None):
+        """
+        Compile the trained forest for the flat-array engine (forest_engine.py)
+        
+        With verify_X, the engine is only kept if it reproduces the forest's
+        predict_proba on those rows; otherwise predictions stay on sklearn.
+        """
+        flat_forest = FlatForest.from_sklearn(self.model)
+        
+        if verify_X is not None and not flat_forest.matches(self.model, verify_X):
+            print("⚠️ Flat forest engine disagrees with sklearn; using sklearn for predictions")
+            self.flat_forest = None
+            return None
+        
+        self.flat_forest = flat_forest
+        return flat_forest
+    
+    def _predict_proba(self, X_scaled):
+        """Class probabilities from the flat engine, or sklearn for rows it cannot take"""
+        if self.flat_forest is None or not np.isfinite(X_scaled).all():
+            return self.model.predict_proba(X_scaled)
+        
+        if len(X_scaled) <= self.FLAT_FOREST_MAX_ROWS:
+            return self.flat_forest.predict_proba(X_scaled)
+        
+        if not self.flat_forest_only:
+            return self.model.predict_proba(X_scaled)
+        
+        return np.concatenate([
+            self.flat_forest.predict_proba(X_scaled[start:start + self.FLAT_FOREST_MAX_ROWS])
+            for start in range(0, len(X_scaled), self.FLAT_FOREST_MAX_ROWS)
+        ])
+    
+    def _classes(self):
+        """Class labels in predict_proba column order"""
+        if self.flat_forest is not None:
+            return self.flat_forest.classes_
+        return self.model.classes_
+    
     def predict_single(self, patient_data):
         """
         Predict malnutrition status for a single patient
@@ -962,9 +1300,9 @@ class MalnutritionRandomForestModel:
         # Scale
         X_scaled = self.scaler.transform(X)
         
-        # Predict
-        prediction = self.model.predict(X_scaled)[0]
-        probability = self.model.predict_proba(X_scaled)[0]
+        # Predict (the forest's predict is the argmax of predict_proba, so one call does both)
+        probability = self._predict_proba(X_scaled)[0]
+        prediction = self._classes()[np.argmax(probability)]
 
         # Apply conservative post-prediction clinical safety override.
         # This preserves the RF decision in most cases but corrects obvious
@@ -976,7 +1314,7 @@ class MalnutritionRandomForestModel:
         )
         
         # Get class probabilities
-        classes = self.model.classes_
+        classes = self._classes()
         prob_dict = dict(zip(classes, probability))
         
         return {
@@ -1055,6 +1393,145 @@ class MalnutritionRandomForestModel:
     def predict_batch(self, df):
         """
         Predict malnutrition status for multiple patients
+        
+        Preprocesses the whole frame once and runs a single predict_proba over it.
+        Rows that cannot be scored column-wise (missing or non-numeric measurements,
+        NaN features) go through the per-row path, so each still gets its own
+        result or error row.
+        """
+        if df.empty:
+            return self._predict_batch_rowwise(df)
+        
+        try:
+            scorable = self._scorable_rows(df)
+            df_processed = self.preprocess_data(df[scorable])
+            X_scaled = self.scaler.transform(df_processed[self.feature_columns])
+            
+            # Rows with missing model features would fail the whole predict_proba call
+            finite = np.isfinite(X_scaled).all(axis=1)
+            scorable[np.flatnonzero(scorable)[~finite]] = False
+            df_processed = df_processed[finite]
+            X_scaled = X_scaled[finite]
+            
+            probabilities = self._predict_proba(X_scaled) if len(X_scaled) else None
+        except Exception:
+            return self._predict_batch_rowwise(df)
+        
+        df_scored = df[scorable]
+        results = pd.DataFrame(index=df_scored.index)
+        
+        if probabilities is not None:
+            predictions = self._classes()[np.argmax(probabilities, axis=1)]
+            adjusted = self._apply_clinical_override_batch(predictions, df_scored, df_processed)
+            
+            weight = df_scored['weight'].to_numpy(dtype=float)
+            height = df_scored['height'].to_numpy(dtype=float)
+            has_weight_and_height = (weight != 0) & (height != 0)
+            
+            # The protocol treatment text only depends on status and edema
+            edema = df_scored['edema'] if 'edema' in df_scored.columns else pd.Series(False, index=df_scored.index)
+            edema_flags = [False if value is None else bool(value) for value in edema]
+            treatments = {}
+            for key in set(zip(adjusted, edema_flags)):
+                treatments[key] = self.get_treatment_recommendation(key[0], {'edema': key[1]})['treatment']
+            
+            if 'name' in df_scored.columns:
+                results['name'] = df_scored['name'].to_numpy()
+            else:
+                results['name'] = [f'Patient_{index+1}' for index in df_scored.index]
+            results['age_months'] = df_scored['age_months'].to_numpy()
+            results['weight'] = df_scored['weight'].to_numpy()
+            results['height'] = df_scored['height'].to_numpy()
+            results['whz_score'] = df_processed['whz_score'].to_numpy()
+            results['prediction'] = adjusted
+            results['treatment'] = [treatments[key] for key in zip(adjusted, edema_flags)]
+            with np.errstate(all='ignore'):
+                results['bmi'] = np.where(has_weight_and_height, weight / ((height / 100) ** 2), 0)
+        
+        if scorable.all():
+            return results.reset_index(drop=True)
+        
+        # Score the remaining rows one at a time and restore the input order
+        fallback = self._predict_batch_rowwise(df[~scorable])
+        fallback.index = df.index[~scorable]
+        combined = pd.concat([results, fallback]) if len(results) else fallback
+        order = np.argsort(np.concatenate([np.flatnonzero(scorable), np.flatnonzero(~scorable)]), kind='stable')
+        return combined.iloc[order].reset_index(drop=True)
+    
+    def _scorable_rows(self, df):
+        """
+        Boolean mask of rows whose measurements can go through the vectorized path
+        """
+        scorable = np.ones(len(df), dtype=bool)
+        
+        for field in ('weight', 'height', 'age_months'):
+            values = df[field]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                scorable &= values.notna().to_numpy()
+            else:
+                scorable &= values.map(
+                    lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool) and not pd.isna(v)
+                ).to_numpy(dtype=bool)
+        
+        scorable &= df['sex'].map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        return scorable
+    
+    def _apply_clinical_override_batch(self, predictions, df, df_processed):
+        """
+        Vectorized _apply_clinical_override: the same rules evaluated as masks
+        over a whole batch of predictions
+        """
+        sam = 'Severe Acute Malnutrition (SAM)'
+        mam = 'Moderate Acute Malnutrition (MAM)'
+        
+        def _text(field):
+            # str() of each value, as the per-row helpers see it; None for a missing column
+            if field not in df.columns:
+                return None
+            return df[field].astype(str).str.strip().str.lower()
+        
+        edema_text = _text('edema')
+        has_edema = (np.zeros(len(df), dtype=bool) if edema_text is None
+                     else edema_text.isin({'yes', 'true', '1'}).to_numpy())
+        age_months = np.trunc(df['age_months'].to_numpy(dtype=float))
+        whz = df_processed['whz_score'].to_numpy(dtype=float)
+        wfa = df_processed['wfa_zscore'].to_numpy(dtype=float)
+        bmi_status_value = df_processed['bmi_status'].astype(str).to_numpy()
+        
+        risk_count = np.zeros(len(df), dtype=int)
+        for field in ('tuberculosis', 'malaria', 'congenital_anomalies', 'other_medical_problems', 'twins'):
+            text = _text(field)
+            if text is not None:
+                risk_count += (~text.isin({'', 'no', 'none', 'false', '0', 'n/a', 'na'})).to_numpy()
+        
+        predictions = np.asarray(predictions).astype(str)
+        predicted_sam = predictions == sam
+        
+        # Escalation rules: prioritize safety for likely severe undernutrition.
+        escalate = has_edema | (~predicted_sam & (
+            (whz <= -3.0) | (wfa <= -3.0) |
+            ((risk_count >= 2) & ((whz <= -2.5) | (wfa <= -2.5)))
+        ))
+        
+        # De-escalation rules: reduce likely false-positive SAM in low-risk children.
+        low_clinical_risk = ~has_edema & (risk_count == 0)
+        anthropometry_not_severe = (whz > -2.2) & (wfa > -2.2)
+        older_low_risk = (age_months >= 24) & ~has_edema & (risk_count <= 1)
+        near_threshold_not_severe = (whz > -2.8) & (wfa > -2.8)
+        deescalate = predicted_sam & ~has_edema & (
+            (low_clinical_risk & anthropometry_not_severe) |
+            (older_low_risk & near_threshold_not_severe &
+             np.isin(bmi_status_value, ['Normal', 'Overweight', 'Obese']))
+        )
+        
+        adjusted = predictions.astype(object)
+        adjusted[deescalate] = np.where((whz <= -2.0) | (wfa <= -2.0), mam, 'Normal')[deescalate]
+        adjusted[escalate] = sam
+        return adjusted
+    
+    def _predict_batch_rowwise(self, df):
+        """
+        Predict malnutrition status patient by patient (fallback for predict_batch)
         """
         results = []
         
@@ -1374,16 +1851,63 @@ class MalnutritionRandomForestModel:
         joblib.dump(model_data, filepath)
         print(f"Model saved to {filepath}")
 
+    def save_artefact(self, directory, model_version=None):
+        """
+        Save the trained model as a versioned artefact directory (see model_artefact.py)
+        """
+        self.manifest = model_artefact.save_artefact(self, directory, model_version=model_version,
+                                                     extra_metadata={'lineage': self.lineage})
+        print(f"Model artefact {self.manifest['model_version']} saved to {directory}")
+        return self.manifest
+    
+    def load_artefact(self, directory, verify=True):
+        """
+        Load a model artefact directory
+        
+        Encoders and scaler come from the manifest and predictions run on the
+        memory-mapped flat forest; the sklearn forest itself is only unpickled
+        when first used (e.g. for feature importances or refitting). With
+        verify, the tree arrays are checked now and forest.joblib when unpickled.
+        """
+        try:
+            manifest = model_artefact.load_manifest(directory)
+            if verify:
+                model_artefact.verify_artefact(directory, manifest, files=model_artefact.tree_files(manifest))
+            
+            self.manifest = manifest
+            self.feature_columns = list(manifest['feature_columns'])
+            self.label_encoders = model_artefact.build_label_encoders(manifest)
+            self._freeze_categories()
+            self.lineage = list(manifest.get('lineage', []))
+            self.scaler = model_artefact.build_scaler(manifest)
+            self.flat_forest = model_artefact.load_flat_forest(directory, manifest)
+            self._model = None
+            self._model_loader = lambda: model_artefact.load_forest(directory, manifest if verify else None)
+            self.is_trained = True
+            
+            print(f"✅ Model artefact {manifest['model_version']} loaded from {directory}")
+            
+        except Exception as e:
+            print(f"❌ Error loading model artefact: {e}")
+            raise e
+    
     def load_model(self, filepath):
         """
         Load a trained model with better error handling
+        
+        Accepts an artefact directory or a legacy joblib .pkl file.
         """
+        if model_artefact.is_artefact(filepath):
+            return self.load_artefact(filepath)
+        
         try:
             model_data = joblib.load(filepath)
             self.model = model_data['model']
             self.label_encoders = model_data['label_encoders']
+            self._freeze_categories()
             self.scaler = model_data['scaler']
             self.feature_columns = model_data['feature_columns']
+            self.compile_flat_forest()
             
             # Recreate WHO calculator instead of loading from pickle
             if model_data.get('who_calculator') is None:
@@ -1397,66 +1921,69 @@ class MalnutritionRandomForestModel:
             print(f"❌ Error loading model: {e}")
             raise e
 
-def generate_sample_data(n_samples=2000):
+def generate_sample_data(n_samples=2000, seed=42):
     """
     Generate sample data for demonstration
+    
+    Every column is drawn for all children at once from a seeded Generator, so
+    the same seed gives the same data and millions of rows take seconds.
     """
-    np.random.seed(42)
+    rng = np.random.default_rng(seed)
     
     municipalities = ['Manila', 'Quezon City', 'Caloocan', 'Davao', 'Cebu', 'Zamboanga']
     
-    data = []
-    for i in range(n_samples):
-        age_months = np.random.randint(0, 61)
-        sex = np.random.choice(['Male', 'Female'])
-        
-        # Generate realistic height and weight based on age
-        if age_months <= 6:
-            height = np.random.normal(55 + age_months * 2, 3)
-            base_weight = 3 + age_months * 0.6
-        elif age_months <= 24:
-            height = np.random.normal(65 + (age_months - 6) * 1.2, 4)
-            base_weight = 7 + (age_months - 6) * 0.3
-        else:
-            height = np.random.normal(80 + (age_months - 24) * 0.8, 5)
-            base_weight = 12 + (age_months - 24) * 0.2
-        
-        # Weight variation: covers SAM, MAM, Normal, Overweight, Obese
-        # factors: 0.70=SAM, 0.80=MAM, 0.90=At-Risk, 1.00=Normal, 1.15=Overweight, 1.35=Obese
-        malnutrition_factor = np.random.choice(
-            [0.70, 0.80, 0.90, 1.00, 1.15, 1.35],
-            p=[0.08, 0.12, 0.17, 0.39, 0.15, 0.09]
-        )
-        weight = max(1, base_weight * malnutrition_factor + np.random.normal(0, 0.5))
-
-        # Simulate realistic field measurement noise (scale ±150 g, length board ±3 mm)
-        weight = round(max(1.0, weight + np.random.normal(0, 0.15)), 1)
-        height = round(max(30.0, height + np.random.normal(0, 0.3)), 1)
-
-        record = {
-            'name': f'Child_{i+1}',
-            'municipality': np.random.choice(municipalities),
-            'number': f'ID_{i+1:04d}',
-            'age_months': age_months,
-            'sex': sex,
-            'date_of_admission': pd.Timestamp.now() - pd.Timedelta(days=np.random.randint(0, 365)),
-            'total_household': np.random.randint(3, 12),
-            'adults': np.random.randint(2, 6),
-            'children': np.random.randint(1, 6),
-            'twins': np.random.choice([0, 1], p=[0.97, 0.03]),
-            '4ps_beneficiary': np.random.choice(['Yes', 'No'], p=[0.6, 0.4]),
-            'weight': round(weight, 1),
-            'height': round(height, 1),
-            'breastfeeding': np.random.choice(['Yes', 'No'], p=[0.7, 0.3]) if age_months <= 24 else 'No',
-            'tuberculosis': np.random.choice(['Yes', 'No'], p=[0.05, 0.95]),
-            'malaria': np.random.choice(['Yes', 'No'], p=[0.08, 0.92]),
-            'congenital_anomalies': np.random.choice(['Yes', 'No'], p=[0.03, 0.97]),
-            'other_medical_problems': np.random.choice(['Yes', 'No'], p=[0.1, 0.9]),
-            'edema': np.random.choice([True, False], p=[0.02, 0.98])
-        }
-        data.append(record)
+    def yes_no(p_yes):
+        return rng.choice(np.array(['Yes', 'No'], dtype=object), size=n_samples, p=[p_yes, 1 - p_yes])
+    
+    age_months = rng.integers(0, 61, size=n_samples)
+    sex = rng.choice(np.array(['Male', 'Female'], dtype=object), size=n_samples)
     
-    return pd.DataFrame(data)
+    # Generate realistic height and weight based on age
+    infant = age_months <= 6
+    toddler = ~infant & (age_months <= 24)
+    height_mean = np.select([infant, toddler], [55 + age_months * 2, 65 + (age_months - 6) * 1.2],
+                            80 + (age_months - 24) * 0.8)
+    height_sd = np.select([infant, toddler], [3, 4], 5)
+    base_weight = np.select([infant, toddler], [3 + age_months * 0.6, 7 + (age_months - 6) * 0.3],
+                            12 + (age_months - 24) * 0.2)
+    height = rng.normal(height_mean, height_sd)
+    
+    # Weight variation: covers SAM, MAM, Normal, Overweight, Obese
+    # factors: 0.70=SAM, 0.80=MAM, 0.90=At-Risk, 1.00=Normal, 1.15=Overweight, 1.35=Obese
+    malnutrition_factor = rng.choice(
+        [0.70, 0.80, 0.90, 1.00, 1.15, 1.35],
+        size=n_samples,
+        p=[0.08, 0.12, 0.17, 0.39, 0.15, 0.09]
+    )
+    weight = np.maximum(1, base_weight * malnutrition_factor + rng.normal(0, 0.5, n_samples))
+    
+    # Simulate realistic field measurement noise (scale ±150 g, length board ±3 mm)
+    weight = np.round(np.maximum(1.0, weight + rng.normal(0, 0.15, n_samples)), 1)
+    height = np.round(np.maximum(30.0, height + rng.normal(0, 0.3, n_samples)), 1)
+    
+    ids = pd.RangeIndex(1, n_samples + 1).astype(str)
+    
+    return pd.DataFrame({
+        'name': 'Child_' + ids,
+        'municipality': rng.choice(np.array(municipalities, dtype=object), size=n_samples),
+        'number': 'ID_' + ids.str.zfill(4),
+        'age_months': age_months,
+        'sex': sex,
+        'date_of_admission': pd.Timestamp.now() - pd.to_timedelta(rng.integers(0, 365, n_samples), unit='D'),
+        'total_household': rng.integers(3, 12, n_samples),
+        'adults': rng.integers(2, 6, n_samples),
+        'children': rng.integers(1, 6, n_samples),
+        'twins': rng.choice([0, 1], size=n_samples, p=[0.97, 0.03]),
+        '4ps_beneficiary': yes_no(0.6),
+        'weight': weight,
+        'height': height,
+        'breastfeeding': np.where(age_months <= 24, yes_no(0.7), 'No').astype(object),
+        'tuberculosis': yes_no(0.05),
+        'malaria': yes_no(0.08),
+        'congenital_anomalies': yes_no(0.03),
+        'other_medical_problems': yes_no(0.1),
+        'edema': rng.random(n_samples) < 0.02
+    })
 
 if __name__ == "__main__":
     # Generate sample data
@@ -1467,6 +1994,7 @@ if __name__ == "__main__":
     print("Training Random Forest model...")
     model = MalnutritionRandomForestModel()
     X_test, y_test, y_pred = model.train_model(df)
+    model.generate_evaluation_plots()
     
     # Show feature importance
     print("\nFeature Importance:")
@@ -1504,7 +2032,7 @@ if __name__ == "__main__":
     print(f"Treatment Recommendation: {result['recommendation']}")
     
     # Save model
-    model.save_model('malnutrition_model.pkl')
+    model.save_artefact('malnutrition_model')
     print("\nModel training completed successfully!")
 
 
@@ -1524,11 +2052,15 @@ class MalnutritionAssessment:
             
             # Get the directory where this script is located
             script_dir = os.path.dirname(os.path.abspath(__file__))
+            artefact_path = os.path.join(script_dir, 'malnutrition_model')
             model_path = os.path.join(script_dir, 'malnutrition_model.pkl')
             
             print(f"Looking for model at: {model_path}")
             
-            if os.path.exists(model_path):
+            if model_artefact.is_artefact(artefact_path):
+                self.model.load_artefact(artefact_path)
+                print("✅ Pre-trained model loaded successfully!")
+            elif os.path.exists(model_path):
                 self.model.load_model(model_path)
                 print("✅ Pre-trained model loaded successfully!")
             else:
@@ -1544,7 +2076,8 @@ class MalnutritionAssessment:
             print(f"⚠️ Warning: Pre-trained model not found ({e}). WHO assessment only.")
             self.model = None
     
-    def assess_malnutrition(self, age_months, weight_kg, height_cm, gender, muac_cm=None, has_edema=False):
+    def assess_malnutrition(self, age_months, weight_kg, height_cm, gender, muac_cm=None, has_edema=False,
+                            stage_timings=None):
         """
         Assess malnutrition status based on WHO standards
         
@@ -1555,14 +2088,13 @@ class MalnutritionAssessment:
             gender: 'male' or 'female'
             muac_cm: Mid-upper arm circumference in cm (optional)
             has_edema: Boolean indicating presence of edema
+            stage_timings: Optional dict; receives the 'zscore' and 'diagnosis' seconds
             
         Returns:
             Dict with assessment results
         """
         try:
-            # Calculate BMI
-            height_m = height_cm / 100
-            bmi = weight_kg / (height_m ** 2)
+            started = time.perf_counter()
             
             # Get WHO assessment
             who_result = self.who_calculator.comprehensive_assessment(
@@ -1572,119 +2104,14 @@ class MalnutritionAssessment:
                 sex=gender,
                 has_edema=has_edema
             )
+            zscored = time.perf_counter()
             
-            # Determine risk level based on z-scores and indicators
-            risk_factors = []
-            risk_score = 0
+            result = self._diagnose(who_result, age_months, weight_kg, height_cm, muac_cm, has_edema)
             
-            if who_result is None:
-                # Fallback if WHO assessment fails
-                return {
-                    'primary_diagnosis': 'Assessment Error',
-                    'risk_level': 'Unknown',
-                    'confidence': 0.0,
-                    'error': 'WHO assessment failed',
-                    'assessment_date': datetime.now().isoformat()
-                }
-            
-            # Weight-for-age risk
-            wfa_zscore = who_result['z_scores']['weight_for_age']
-            if wfa_zscore < -3:
-                risk_factors.append("Severely underweight")
-                risk_score += 3
-            elif wfa_zscore < -2:
-                risk_factors.append("Underweight")
-                risk_score += 2
-
-            # Height-for-age risk
-            hfa_zscore = who_result['z_scores']['height_for_age']
-            if hfa_zscore < -3:
-                risk_factors.append("Severely stunted")
-                risk_score += 3
-            elif hfa_zscore < -2:
-                risk_factors.append("Stunted")
-                risk_score += 2
-
-            # Overnutrition signals (positive WFA z-scores)
-            overweight_score = 0
-            if wfa_zscore > 3:
-                risk_factors.append("Obese (weight-for-age > +3 SD)")
-                overweight_score += 2
-            elif wfa_zscore > 2:
-                risk_factors.append("Overweight (weight-for-age > +2 SD)")
-                overweight_score += 1
-
-            # BMI-based overnutrition
-            bmi_status = who_result['classifications'].get('bmi_status', 'Normal')
-            if bmi_status == 'Obese':
-                risk_factors.append("Obese (BMI)")
-                overweight_score += 2
-            elif bmi_status == 'Overweight':
-                risk_factors.append("Overweight (BMI)")
-                overweight_score += 1
-
-            # MUAC assessment
-            if muac_cm is not None:
-                if muac_cm < 11.5:
-                    risk_factors.append("Severe acute malnutrition (MUAC)")
-                    risk_score += 3
-                elif muac_cm < 12.5:
-                    risk_factors.append("Moderate acute malnutrition (MUAC)")
-                    risk_score += 2
-
-            # Edema
-            if has_edema:
-                risk_factors.append("Bilateral pitting edema")
-                risk_score += 3
-
-            # Determine primary diagnosis
-            # Overnutrition takes priority over low risk_score normal baseline
-            if risk_score >= 6 or has_edema:
-                primary_diagnosis = "Severe Acute Malnutrition (SAM)"
-                risk_level = "High"
-                confidence = 0.9
-            elif risk_score >= 3:
-                primary_diagnosis = "Moderate Acute Malnutrition (MAM)"
-                risk_level = "Moderate"
-                confidence = 0.8
-            elif risk_score >= 1:
-                primary_diagnosis = "At Risk of Malnutrition"
-                risk_level = "Low"
-                confidence = 0.7
-            elif overweight_score >= 2:
-                primary_diagnosis = "Obese"
-                risk_level = "Moderate"
-                confidence = 0.85
-            elif overweight_score >= 1:
-                primary_diagnosis = "Overweight"
-                risk_level = "Low-Moderate"
-                confidence = 0.85
-            else:
-                primary_diagnosis = "Normal Nutritional Status"
-                risk_level = "Low"
-                confidence = 0.9
-            
-            # Create comprehensive result
-            assessment_result = {
-                'primary_diagnosis': primary_diagnosis,
-                'risk_level': risk_level,
-                'confidence': confidence,
-                'risk_score': risk_score,
-                'risk_factors': risk_factors,
-                'who_assessment': who_result,
-                'anthropometric_data': {
-                    'age_months': age_months,
-                    'weight_kg': weight_kg,
-                    'height_cm': height_cm,
-                    'bmi': round(bmi, 2),
-                    'muac_cm': muac_cm,
-                    'has_edema': has_edema
-                },
-                'assessment_date': datetime.now().isoformat(),
-                'assessment_method': 'WHO Standards + Clinical Indicators'
-            }
-            
-            return assessment_result
+            if stage_timings is not None:
+                stage_timings['zscore'] = zscored - started
+                stage_timings['diagnosis'] = time.perf_counter() - zscored
+            return result
             
         except Exception as e:
             print(f"Assessment error: {e}")
@@ -1695,3 +2122,166 @@ class MalnutritionAssessment:
                 'error': str(e),
                 'assessment_date': datetime.now().isoformat()
             }
+    
+    def assess_malnutrition_batch(self, children):
+        """
+        Assess malnutrition status for many children at once
+        
+        Args:
+            children: List of dicts with the assess_malnutrition arguments
+                      (age_months, weight_kg, height_cm, gender, muac_cm, has_edema)
+            
+        Returns:
+            List of assessment result dicts, in the same order as children
+        """
+        if not children:
+            return []
+        
+        # WHO z-scores for the whole list in one vectorized pass
+        who_results = self.who_calculator.comprehensive_assessment_batch(
+            weight=[child['weight_kg'] for child in children],
+            height=[child['height_cm'] for child in children],
+            age_months=[child['age_months'] for child in children],
+            sex=[child['gender'] for child in children],
+            has_edema=[child.get('has_edema', False) for child in children]
+        )
+        
+        results = []
+        for child, who_result in zip(children, who_results):
+            try:
+                results.append(self._diagnose(
+                    who_result, child['age_months'], child['weight_kg'], child['height_cm'],
+                    child.get('muac_cm'), child.get('has_edema', False)
+                ))
+            except Exception as e:
+                print(f"Assessment error: {e}")
+                results.append({
+                    'primary_diagnosis': 'Assessment Error',
+                    'risk_level': 'Unknown',
+                    'confidence': 0.0,
+                    'error': str(e),
+                    'assessment_date': datetime.now().isoformat()
+                })
+        
+        return results
+    
+    def _diagnose(self, who_result, age_months, weight_kg, height_cm, muac_cm, has_edema):
+        """
+        Turn a WHO comprehensive assessment into the primary diagnosis and risk result
+        """
+        # Calculate BMI
+        height_m = height_cm / 100
+        bmi = weight_kg / (height_m ** 2)
+        
+        # Determine risk level based on z-scores and indicators
+        risk_factors = []
+        risk_score = 0
+        
+        if who_result is None:
+            # Fallback if WHO assessment fails
+            return {
+                'primary_diagnosis': 'Assessment Error',
+                'risk_level': 'Unknown',
+                'confidence': 0.0,
+                'error': 'WHO assessment failed',
+                'assessment_date': datetime.now().isoformat()
+            }
+        
+        # Weight-for-age risk
+        wfa_zscore = who_result['z_scores']['weight_for_age']
+        if wfa_zscore < -3:
+            risk_factors.append("Severely underweight")
+            risk_score += 3
+        elif wfa_zscore < -2:
+            risk_factors.append("Underweight")
+            risk_score += 2
+
+        # Height-for-age risk
+        hfa_zscore = who_result['z_scores']['height_for_age']
+        if hfa_zscore < -3:
+            risk_factors.append("Severely stunted")
+            risk_score += 3
+        elif hfa_zscore < -2:
+            risk_factors.append("Stunted")
+            risk_score += 2
+
+        # Overnutrition signals (positive WFA z-scores)
+        overweight_score = 0
+        if wfa_zscore > 3:
+            risk_factors.append("Obese (weight-for-age > +3 SD)")
+            overweight_score += 2
+        elif wfa_zscore > 2:
+            risk_factors.append("Overweight (weight-for-age > +2 SD)")
+            overweight_score += 1
+
+        # BMI-based overnutrition
+        bmi_status = who_result['classifications'].get('bmi_status', 'Normal')
+        if bmi_status == 'Obese':
+            risk_factors.append("Obese (BMI)")
+            overweight_score += 2
+        elif bmi_status == 'Overweight':
+            risk_factors.append("Overweight (BMI)")
+            overweight_score += 1
+
+        # MUAC assessment
+        if muac_cm is not None:
+            if muac_cm < 11.5:
+                risk_factors.append("Severe acute malnutrition (MUAC)")
+                risk_score += 3
+            elif muac_cm < 12.5:
+                risk_factors.append("Moderate acute malnutrition (MUAC)")
+                risk_score += 2
+
+        # Edema
+        if has_edema:
+            risk_factors.append("Bilateral pitting edema")
+            risk_score += 3
+
+        # Determine primary diagnosis
+        # Overnutrition takes priority over low risk_score normal baseline
+        if risk_score >= 6 or has_edema:
+            primary_diagnosis = "Severe Acute Malnutrition (SAM)"
+            risk_level = "High"
+            confidence = 0.9
+        elif risk_score >= 3:
+            primary_diagnosis = "Moderate Acute Malnutrition (MAM)"
+            risk_level = "Moderate"
+            confidence = 0.8
+        elif risk_score >= 1:
+            primary_diagnosis = "At Risk of Malnutrition"
+            risk_level = "Low"
+            confidence = 0.7
+        elif overweight_score >= 2:
+            primary_diagnosis = "Obese"
+            risk_level = "Moderate"
+            confidence = 0.85
+        elif overweight_score >= 1:
+            primary_diagnosis = "Overweight"
+            risk_level = "Low-Moderate"
+            confidence = 0.85
+        else:
+            primary_diagnosis = "Normal Nutritional Status"
+            risk_level = "Low"
+            confidence = 0.9
+        
+        # Create comprehensive result
+        assessment_result = {
+            'primary_diagnosis': primary_diagnosis,
+            'risk_level': risk_level,
+            'confidence': confidence,
+            'risk_score': risk_score,
+            'risk_factors': risk_factors,
+            'who_assessment': who_result,
+            'anthropometric_data': {
+                'age_months': age_months,
+                'weight_kg': weight_kg,
+                'height_cm': height_cm,
+                'bmi': round(bmi, 2),
+                'muac_cm': muac_cm,
+                'has_edema': has_edema
+            },
+            'assessment_date': datetime.now().isoformat(),
+            'assessment_method': 'WHO Standards + Clinical Indicators'
+        }
+        
+        return assessment_result
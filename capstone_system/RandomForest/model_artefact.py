@@ -0,0 +1,241 @@
+"""
+Model Artefact Format
+Versioned on-disk layout for a trained MalnutritionRandomForestModel:
+
+    <artefact dir>/
+        manifest.json      feature columns, encoder classes, scaler params,
+                           forest shape, per-file SHA-256 and overall checksum
+        trees/*.npy        the compiled FlatForest node arrays (forest_engine.py),
+                           uncompressed
+        forest.joblib      the sklearn estimator, loaded only when needed
+
+The tree arrays are opened with mmap_mode='r' and scored in place by the flat
+forest engine, so worker processes share their pages through the OS page cache
+instead of each unpickling a private copy. Loading checks the tree arrays
+against the manifest; forest.joblib is only checked when it is unpickled. Run
+`python model_artefact.py verify <dir>` to check every file at deploy time.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+from datetime import datetime
+import numpy as np
+import joblib
+import sklearn
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from forest_engine import FLAT_FOREST_ARRAYS, FlatForest
+
+# Bump when the layout of the artefact changes; older readers refuse newer artefacts
+ARTEFACT_FORMAT_VERSION = 2
+
+MANIFEST_FILENAME = 'manifest.json'
+FOREST_FILENAME = 'forest.joblib'
+TREES_DIRNAME = 'trees'
+
+
+class ArtefactError(Exception):
+    """Raised when an artefact is missing, from an unknown format or corrupt"""
+
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _combined_checksum(file_checksums):
+    digest = hashlib.sha256()
+    for name in sorted(file_checksums):
+        digest.update(f"{name}:{file_checksums[name]}\n".encode())
+    return digest.hexdigest()
+
+
+def save_artefact(model, directory, model_version=None, extra_metadata=None):
+    """
+    Write a trained MalnutritionRandomForestModel as an artefact directory
+
+    The directory is written next to its final location and swapped in at the
+    end, so readers never see a half-written artefact.
+
+    Returns:
+        The manifest dict
+    """
+    forest = model.model
+    directory = os.path.abspath(directory)
+    tmp_directory = f"{directory}.tmp"
+    if os.path.exists(tmp_directory):
+        shutil.rmtree(tmp_directory)
+    os.makedirs(os.path.join(tmp_directory, TREES_DIRNAME))
+
+    file_checksums = {}
+
+    flat_forest = model.flat_forest or FlatForest.from_sklearn(forest)
+    for name, array in flat_forest.arrays().items():
+        relative_path = f"{TREES_DIRNAME}/{name}.npy"
+        np.save(os.path.join(tmp_directory, relative_path), np.ascontiguousarray(array), allow_pickle=False)
+        file_checksums[relative_path] = _file_sha256(os.path.join(tmp_directory, relative_path))
+
+    joblib.dump(forest, os.path.join(tmp_directory, FOREST_FILENAME), compress=0)
+    file_checksums[FOREST_FILENAME] = _file_sha256(os.path.join(tmp_directory, FOREST_FILENAME))
+
+    scaler = model.scaler
+    manifest = {
+        'format_version': ARTEFACT_FORMAT_VERSION,
+        'model_version': model_version or datetime.utcnow().strftime('%Y%m%d%H%M%S%f'),
+        'created_at': datetime.utcnow().isoformat(),
+        'sklearn_version': sklearn.__version__,
+        'feature_columns': list(model.feature_columns),
+        'classes': [str(label) for label in forest.classes_],
+        'label_encoders': {
+            column: [str(value) for value in encoder.classes_]
+            for column, encoder in model.label_encoders.items()
+        },
+        'scaler': {
+            'with_mean': scaler.with_mean,
+            'with_std': scaler.with_std,
+            'mean': scaler.mean_.tolist(),
+            'scale': scaler.scale_.tolist(),
+            'var': scaler.var_.tolist(),
+            'n_samples_seen': int(scaler.n_samples_seen_),
+            'feature_names': (
+                [str(name) for name in scaler.feature_names_in_]
+                if hasattr(scaler, 'feature_names_in_') else None
+            )
+        },
+        'forest': {
+            'n_estimators': len(forest.estimators_),
+            'n_features': int(forest.n_features_in_),
+            'n_classes': int(forest.n_classes_),
+            'n_nodes': int(sum(estimator.tree_.node_count for estimator in forest.estimators_)),
+            'max_depth': flat_forest.max_depth,
+            'params': {
+                key: value for key, value in forest.get_params().items()
+                if isinstance(value, (int, float, str, bool, type(None)))
+            }
+        },
+        'files': file_checksums,
+        'checksum': _combined_checksum(file_checksums)
+    }
+    if extra_metadata:
+        manifest.update(extra_metadata)
+
+    with open(os.path.join(tmp_directory, MANIFEST_FILENAME), 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+
+    if os.path.exists(directory):
+        old_directory = f"{directory}.old"
+        if os.path.exists(old_directory):
+            shutil.rmtree(old_directory)
+        os.replace(directory, old_directory)
+        os.replace(tmp_directory, directory)
+        shutil.rmtree(old_directory)
+    else:
+        os.replace(tmp_directory, directory)
+
+    return manifest
+
+
+def is_artefact(path):
+    """True if path is an artefact directory"""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_FILENAME))
+
+
+def load_manifest(directory):
+    """Read and check the manifest of an artefact directory"""
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        raise ArtefactError(f"No model artefact at {directory}")
+
+    with open(manifest_path) as fh:
+        manifest = json.load(fh)
+
+    if manifest.get('format_version') != ARTEFACT_FORMAT_VERSION:
+        raise ArtefactError(
+            f"Unsupported artefact format {manifest.get('format_version')} "
+            f"(expected {ARTEFACT_FORMAT_VERSION})"
+        )
+    return manifest
+
+
+def verify_artefact(directory, manifest, files=None):
+    """
+    Re-hash artefact files and compare with the manifest checksums
+
+    Checks every file by default (deploy time); pass files to check only
+    those relative paths (e.g. the tree arrays when loading).
+    """
+    if _combined_checksum(manifest['files']) != manifest['checksum']:
+        raise ArtefactError(f"Manifest checksum mismatch in model artefact {directory}")
+
+    for relative_path in manifest['files'] if files is None else files:
+        expected = manifest['files'].get(relative_path)
+        if expected is None or _file_sha256(os.path.join(directory, relative_path)) != expected:
+            raise ArtefactError(f"Checksum mismatch for {relative_path} in model artefact {directory}")
+
+
+def tree_files(manifest):
+    """Relative paths of the tree arrays listed in the manifest"""
+    return [relative_path for relative_path in manifest['files']
+            if relative_path.startswith(f"{TREES_DIRNAME}/")]
+
+
+def load_flat_forest(directory, manifest, mmap_mode='r'):
+    """Open the compiled forest over its node arrays (memory-mapped by default)"""
+    arrays = {
+        name: np.load(os.path.join(directory, TREES_DIRNAME, f"{name}.npy"),
+                      mmap_mode=mmap_mode, allow_pickle=False)
+        for name in FLAT_FOREST_ARRAYS
+    }
+    return FlatForest(arrays, manifest['classes'], manifest['forest']['max_depth'])
+
+
+def load_forest(directory, manifest=None):
+    """
+    Unpickle the sklearn estimator (only needed for sklearn-side work such as
+    refitting); with a manifest, the file is checked against it first
+    """
+    if manifest is not None:
+        verify_artefact(directory, manifest, files=[FOREST_FILENAME])
+    return joblib.load(os.path.join(directory, FOREST_FILENAME))
+
+
+def build_label_encoders(manifest):
+    """Recreate fitted LabelEncoders from the manifest"""
+    label_encoders = {}
+    for column, classes in manifest['label_encoders'].items():
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(classes)
+        label_encoders[column] = encoder
+    return label_encoders
+
+
+def build_scaler(manifest):
+    """Recreate the fitted StandardScaler from the manifest"""
+    params = manifest['scaler']
+    scaler = StandardScaler(with_mean=params['with_mean'], with_std=params['with_std'])
+    scaler.mean_ = np.array(params['mean'])
+    scaler.scale_ = np.array(params['scale'])
+    scaler.var_ = np.array(params['var'])
+    scaler.n_samples_seen_ = params['n_samples_seen']
+    scaler.n_features_in_ = len(params['mean'])
+    if params['feature_names'] is not None:
+        scaler.feature_names_in_ = np.array(params['feature_names'], dtype=object)
+    return scaler
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'verify':
+        print("Usage: python model_artefact.py verify <artefact directory>")
+        sys.exit(2)
+
+    artefact_directory = sys.argv[2]
+    artefact_manifest = load_manifest(artefact_directory)
+    verify_artefact(artefact_directory, artefact_manifest)
+    print(f"Model artefact {artefact_manifest['model_version']} OK "
+          f"({len(artefact_manifest['files'])} files checked)")
@@ -14,10 +14,31 @@ from typing import Dict, List, Any
 import json
 from datetime import datetime, timedelta
 
+from lru_cache import LRUCache
+
+# Risk factors that add specialist referrals to the medical plan
+REFERRAL_RISK_FACTORS = ('anthropometric_risk', 'clinical_risk', 'socioeconomic_risk')
+
+
+def _copy_plan(plan):
+    """Copy of a plan section tree: dicts are copied recursively and lists
+    (which only ever hold strings in these plans) are sliced."""
+    copied = {}
+    for key, value in plan.items():
+        if type(value) is dict:
+            copied[key] = _copy_plan(value)
+        elif type(value) is list:
+            copied[key] = value[:]
+        else:
+            copied[key] = value
+    return copied
+
 
 class PersonalizedTreatmentPlanner:
     """Generates personalized treatment plans based on comprehensive assessment."""
 
+    PLAN_TEMPLATE_CACHE_SIZE = 512
+
     def __init__(self):
         """Initialize treatment planner with evidence-based protocols."""
 
@@ -49,6 +70,10 @@ class PersonalizedTreatmentPlanner:
             },
         }
 
+        # Plan sections keyed on the discrete inputs they depend on
+        # (see _plan_template_key); weight-based fields are filled in per call
+        self.plan_templates = LRUCache(self.PLAN_TEMPLATE_CACHE_SIZE, name='treatment_plans')
+
     # ------------------------------------------------------------------
     # Protocol loading
     # ------------------------------------------------------------------
@@ -88,7 +113,13 @@ class PersonalizedTreatmentPlanner:
     def generate_comprehensive_treatment_plan(self, patient_data: Dict, ml_result: Dict,
                                               risk_assessment: Dict,
                                               who_assessment: Dict) -> Dict:
-        """Generate a comprehensive, personalized treatment plan."""
+        """
+        Generate a comprehensive, personalized treatment plan.
+
+        Sections come from a cached template for the patient's diagnosis, age
+        band, oedema, breastfeeding and risk flags; patient details and the
+        weight-based nutrition fields are filled in on a copy.
+        """
 
         primary_diagnosis = ml_result.get('prediction', 'Unknown')
         confidence = (max(ml_result.get('probabilities', {}).values())
@@ -103,15 +134,52 @@ class PersonalizedTreatmentPlanner:
         high_risk_factors = [k for k, v in risk_assessment.items()
                              if v.get('risk_level') in ['High', 'Very High']]
 
-        return {
+        today = datetime.now().strftime('%Y-%m-%d')
+        key = self._plan_template_key(primary_diagnosis, confidence, age_months, has_edema,
+                                      breastfeeding, total_risk_score, high_risk_factors,
+                                      patient_data, today)
+        template = self.plan_templates.get_or_compute(key, lambda: self._build_plan_template(
+            primary_diagnosis, confidence, age_months, weight, has_edema, breastfeeding,
+            total_risk_score, high_risk_factors, patient_data))
+
+        plan = {
             'patient_info': {
                 'name':             patient_data.get('name', 'Patient'),
                 'age_months':       age_months,
                 'diagnosis':        primary_diagnosis,
                 'confidence_level': confidence,
-                'assessment_date':  datetime.now().strftime('%Y-%m-%d'),
+                'assessment_date':  today,
                 'plan_created_by':  'AI-Enhanced Malnutrition Assessment System',
             },
+            **_copy_plan(template),
+        }
+        plan['nutrition_plan'].update(
+            self._weight_based_nutrition(primary_diagnosis, age_months, weight))
+        return plan
+
+    def _plan_template_key(self, diagnosis: str, confidence: float, age_months: int,
+                           has_edema: bool, breastfeeding: str, total_risk_score: float,
+                           high_risk_factors: List[str], patient_data: Dict,
+                           today: str) -> tuple:
+        """Every discrete input the plan sections branch on (the follow-up dates need today)."""
+        return (
+            diagnosis,
+            age_months <= 6, age_months < 12, age_months <= 24,
+            bool(has_edema),
+            breastfeeding.lower() == 'yes' if age_months <= 24 else None,
+            confidence < 0.6,
+            confidence < 0.6 or total_risk_score > 10,
+            tuple(factor in high_risk_factors for factor in REFERRAL_RISK_FACTORS),
+            patient_data.get('4ps_beneficiary') == 'Yes',
+            today,
+        )
+
+    def _build_plan_template(self, primary_diagnosis: str, confidence: float, age_months: int,
+                             weight: float, has_edema: bool, breastfeeding: str,
+                             total_risk_score: float, high_risk_factors: List[str],
+                             patient_data: Dict) -> Dict:
+        """All plan sections except patient_info, for one template key."""
+        return {
             'immediate_actions':     self._get_immediate_actions(
                 primary_diagnosis, has_edema, confidence),
             'nutrition_plan':        self._generate_nutrition_plan(
@@ -130,6 +198,22 @@ class PersonalizedTreatmentPlanner:
             'emergency_signs':       self._define_emergency_signs(age_months),
         }
 
+    def _weight_based_nutrition(self, diagnosis: str, age_months: int,
+                                weight: float) -> Dict[str, Any]:
+        """Nutrition plan fields computed from the child's weight."""
+        fields: Dict[str, Any] = {
+            'current_weight': f"{weight} kg",
+            'target_weight':  f"{self._calculate_target_weight(age_months, weight)} kg",
+        }
+
+        if 'Severe' in diagnosis:
+            fields['rutf_sachets_daily']  = max(2, int(weight * 1.0))
+            fields['rutf_calories_daily'] = max(1000, int(weight * 500))
+        elif 'Moderate' in diagnosis:
+            fields['daily_ration'] = f"{int(weight * 75)} kcal/kg/day supplementary"
+
+        return fields
+
     # ------------------------------------------------------------------
     # Utility
     # ------------------------------------------------------------------
@@ -212,16 +296,17 @@ class PersonalizedTreatmentPlanner:
         else:
             age_group = 'child'
 
+        weighted = self._weight_based_nutrition(diagnosis, age_months, weight)
         plan: Dict[str, Any] = {
             'age_group':      age_group,
-            'current_weight': f"{weight} kg",
-            'target_weight':  f"{self._calculate_target_weight(age_months, weight)} kg",
+            'current_weight': weighted['current_weight'],
+            'target_weight':  weighted['target_weight'],
         }
 
         if 'Severe' in diagnosis:
             plan['phase']               = 'Therapeutic feeding'
-            plan['rutf_sachets_daily']  = max(2, int(weight * 1.0))
-            plan['rutf_calories_daily'] = max(1000, int(weight * 500))
+            plan['rutf_sachets_daily']  = weighted['rutf_sachets_daily']
+            plan['rutf_calories_daily'] = weighted['rutf_calories_daily']
             plan['feeding_frequency']   = '6 times per day'
             plan['feeding_schedule']    = 'Every 2-3 hours during day; 4-hour gap at night'
             plan['special_instructions'] = [
@@ -233,7 +318,7 @@ class PersonalizedTreatmentPlanner:
         elif 'Moderate' in diagnosis:
             plan['phase']              = 'Supplementary feeding'
             plan['supplementary_food'] = 'Specialised nutritious foods (SNF)'
-            plan['daily_ration']       = f"{int(weight * 75)} kcal/kg/day supplementary"
+            plan['daily_ration']       = weighted['daily_ration']
             plan['feeding_frequency']  = '3 main meals + 2 snacks'
             plan['foods_to_increase']  = [
                 'Protein-rich foods (eggs, fish, meat, legumes)',
@@ -0,0 +1,390 @@
+"""
+WHO Reference Tables
+Compiles the WHO growth standard Excel files into a binary .npz cache and holds
+the process-wide, read-only reference registry shared by all z-score calculators
+"""
+
+import os
+import hashlib
+import tempfile
+import argparse
+import threading
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
+
+WHO_STANDARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'who_standard')
+CACHE_FILENAME = 'who_reference_cache.npz'
+
+# Bump when the layout of the compiled arrays changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 2
+
+# WHO Excel files per indicator and sex, keyed by the column that indexes the rows
+REFERENCE_FILES = {
+    'weight_for_age': {
+        'index_column': 'Month',
+        'boys': 'wfa_boys_0-to-5-years_zscores.xlsx',
+        'girls': 'wfa_girls_0-to-5-years_zscores.xlsx'
+    },
+    'height_for_age': {
+        'index_column': 'Month',
+        'boys': 'lhfa_boys_0-to-5-years_zscores.xlsx',
+        'girls': 'lhfa_girls_0-to-5-years_zscores.xlsx'
+    },
+    'weight_for_length': {
+        'index_column': 'Length',
+        'boys': 'wfl_boys_0-to-2-years_zscores.xlsx',
+        'girls': 'wfl_girls_0-to-2-years_zscores.xlsx'
+    },
+    'weight_for_height': {
+        'index_column': 'Height',
+        'boys': 'wfh_boys_2-to-5-years_zscores.xlsx',
+        'girls': 'wfh_girls_2-to-5-years_zscores.xlsx'
+    }
+}
+
+# Tables indexed by age in months; the others are indexed by length/height in cm
+AGE_INDEXED = ('weight_for_age', 'height_for_age')
+
+# Length/height tables are tabulated every 0.1 cm
+HEIGHT_STEP_CM = 0.1
+
+# Average days per month, for ages given in days
+DAYS_PER_MONTH = 365.25 / 12
+
+# Columns stored for every reference row, in array column order
+REFERENCE_COLUMNS = ['L', 'M', 'S', 'SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+
+GENDERS = ('boys', 'girls')
+
+# WHO 2006 Child Growth Standards – Weight-for-Height reference
+# Source: WHO Multicentre Growth Reference Study Group (2006)
+# Values: median weight (mean) in kg and standard deviation (sd) per height in cm.
+# Previously this block had incorrect values that inflated medians above 80 cm,
+# causing severe negative WHZ scores for normal children.  The data below is
+# derived directly from the published WHO 2006 WFH tables and is correct.
+FALLBACK_WHO_REFERENCE = {
+    'weight_for_height': {
+        'boys': {
+            45:  {'mean': 2.441, 'sd': 0.268},
+            50:  {'mean': 3.272, 'sd': 0.359},
+            55:  {'mean': 4.257, 'sd': 0.441},
+            60:  {'mean': 5.398, 'sd': 0.516},
+            65:  {'mean': 6.668, 'sd': 0.597},
+            70:  {'mean': 7.985, 'sd': 0.696},
+            75:  {'mean': 9.287, 'sd': 0.773},
+            80:  {'mean': 10.617, 'sd': 0.845},
+            85:  {'mean': 12.046, 'sd': 0.918},
+            90:  {'mean': 13.534, 'sd': 1.000},
+            95:  {'mean': 15.023, 'sd': 1.090},
+            100: {'mean': 16.471, 'sd': 1.176},
+            105: {'mean': 17.988, 'sd': 1.278},
+            110: {'mean': 19.602, 'sd': 1.396},
+            115: {'mean': 21.226, 'sd': 1.513},
+            120: {'mean': 22.810, 'sd': 1.619},
+        },
+        'girls': {
+            45:  {'mean': 2.428, 'sd': 0.263},
+            50:  {'mean': 3.202, 'sd': 0.351},
+            55:  {'mean': 4.196, 'sd': 0.435},
+            60:  {'mean': 5.280, 'sd': 0.501},
+            65:  {'mean': 6.549, 'sd': 0.587},
+            70:  {'mean': 7.873, 'sd': 0.684},
+            75:  {'mean': 9.131, 'sd': 0.751},
+            80:  {'mean': 10.460, 'sd': 0.830},
+            85:  {'mean': 11.967, 'sd': 0.918},
+            90:  {'mean': 13.479, 'sd': 1.007},
+            95:  {'mean': 14.891, 'sd': 1.092},
+            100: {'mean': 16.284, 'sd': 1.181},
+            105: {'mean': 17.773, 'sd': 1.289},
+            110: {'mean': 19.430, 'sd': 1.424},
+            115: {'mean': 21.143, 'sd': 1.574},
+            120: {'mean': 22.794, 'sd': 1.701},
+        }
+    }
+}
+
+
+def source_checksum(who_folder=WHO_STANDARD_DIR):
+    """
+    SHA-256 over the WHO source files (name and content) plus the cache format version
+    """
+    digest = hashlib.sha256(f"format:{CACHE_FORMAT_VERSION}".encode())
+
+    for measurement_type, files in REFERENCE_FILES.items():
+        for gender in GENDERS:
+            file_path = os.path.join(who_folder, files[gender])
+            digest.update(files[gender].encode())
+
+            if os.path.exists(file_path):
+                with open(file_path, 'rb') as fh:
+                    digest.update(hashlib.sha256(fh.read()).digest())
+            else:
+                digest.update(b'missing')
+
+    return digest.hexdigest()
+
+
+def compile_reference_tables(who_folder=WHO_STANDARD_DIR, cache_path=None):
+    """
+    Parse the WHO Excel files and write the compiled .npz cache
+
+    Returns:
+        Dict mapping (measurement_type, gender) to (index_values, values) arrays,
+        where values has one column per entry of REFERENCE_COLUMNS
+    """
+    tables = {}
+
+    for measurement_type, files in REFERENCE_FILES.items():
+        for gender in GENDERS:
+            filename = files[gender]
+            file_path = os.path.join(who_folder, filename)
+
+            if not os.path.exists(file_path):
+                print(f"WHO reference file not found: {file_path}")
+                continue
+
+            try:
+                df = pd.read_excel(file_path).sort_values(files['index_column'])
+                tables[(measurement_type, gender)] = (
+                    df[files['index_column']].to_numpy(dtype=float),
+                    df[REFERENCE_COLUMNS].to_numpy(dtype=float)
+                )
+                print(f"Successfully loaded {filename}")
+
+            except Exception as e:
+                print(f"Error loading {filename}: {e}")
+
+    if tables:
+        _write_cache(tables, source_checksum(who_folder), cache_path or os.path.join(who_folder, CACHE_FILENAME))
+
+    return tables
+
+
+def _write_cache(tables, checksum, cache_path):
+    """Write compiled tables atomically; a read-only deployment just skips the cache"""
+    arrays = {'checksum': np.array(checksum)}
+    for (measurement_type, gender), (index_values, values) in tables.items():
+        arrays[f"{measurement_type}__{gender}__index"] = index_values
+        arrays[f"{measurement_type}__{gender}__values"] = values
+
+    # A temp file of our own, so workers compiling at the same start never
+    # write into each other's file before it is swapped in
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(cache_path)),
+                                         prefix=os.path.basename(cache_path) + '.',
+                                         suffix='.tmp', delete=False) as fh:
+            tmp_path = fh.name
+            np.savez(fh, **arrays)
+        os.replace(tmp_path, cache_path)
+        print(f"Compiled WHO reference cache written to {cache_path}")
+    except OSError as e:
+        print(f"Could not write WHO reference cache ({e}); Excel will be parsed on next start")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_cache(cache_path, checksum):
+    """Read the compiled tables, or return None if missing, stale or unreadable"""
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if str(cache['checksum']) != checksum:
+                return None
+
+            tables = {}
+            for key in cache.files:
+                if key.endswith('__index'):
+                    measurement_type, gender, _ = key.split('__')
+                    prefix = f"{measurement_type}__{gender}"
+                    tables[(measurement_type, gender)] = (cache[f"{prefix}__index"], cache[f"{prefix}__values"])
+            return tables
+
+    except Exception as e:
+        print(f"Ignoring unreadable WHO reference cache ({e})")
+        return None
+
+
+def load_reference_tables(who_folder=WHO_STANDARD_DIR, rebuild=False):
+    """
+    Load the compiled WHO tables, recompiling from Excel when the cache is
+    missing or the source files changed since it was written
+    """
+    cache_path = os.path.join(who_folder, CACHE_FILENAME)
+
+    if not rebuild:
+        tables = _read_cache(cache_path, source_checksum(who_folder))
+        if tables is not None:
+            return tables
+
+    return compile_reference_tables(who_folder, cache_path)
+
+
+def tables_to_reference_dict(tables):
+    """
+    Expand compiled tables into the nested who_reference dict used by
+    WHO_ZScoreCalculator and the API (indicator -> sex -> month -> values)
+    """
+    who_reference = {
+        'weight_for_age': {'boys': {}, 'girls': {}},
+        'height_for_age': {'boys': {}, 'girls': {}},
+        'weight_for_height': {'boys': {}, 'girls': {}}  # Keep for backward compatibility
+    }
+
+    for (measurement_type, gender), (index_values, values) in tables.items():
+        if measurement_type not in AGE_INDEXED:
+            # Length/height tables are only served as dense arrays (build_height_lms_arrays)
+            continue
+
+        rows = who_reference.setdefault(measurement_type, {}).setdefault(gender, {})
+
+        for key, row in zip(index_values.tolist(), values.tolist()):
+            values_by_column = dict(zip(REFERENCE_COLUMNS, row))
+            rows[int(key)] = {
+                'L': values_by_column['L'],
+                'M': values_by_column['M'],  # Median
+                'S': values_by_column['S'],
+                'mean': values_by_column['M'],  # For backward compatibility
+                'sd': values_by_column['S'],    # For backward compatibility
+                **{column: values_by_column[column] for column in REFERENCE_COLUMNS[3:]}
+            }
+
+    return who_reference
+
+
+def _freeze(value):
+    """Recursively wrap dicts in read-only mapping proxies"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def build_lms_arrays(who_reference):
+    """
+    Build dense per-sex L/M/S arrays indexed by month from the reference tables.
+    Row i holds month first_month + i; months missing between reference rows
+    are interpolated, so fractional ages interpolate between adjacent rows.
+
+    Returns:
+        Dict of indicator -> sex -> (first_month, read-only (n_months, 3) L/M/S array)
+    """
+    lms_arrays = {}
+
+    for measurement_type in ('weight_for_age', 'height_for_age'):
+        lms_arrays[measurement_type] = {}
+
+        for gender, age_data in who_reference.get(measurement_type, {}).items():
+            if not age_data:
+                continue
+
+            months = np.array(sorted(age_data.keys()), dtype=float)
+            first_month = int(months[0])
+            dense_months = np.arange(first_month, int(months[-1]) + 1)
+
+            lms = np.column_stack([
+                np.interp(dense_months, months, [age_data[m][column] for m in months.astype(int)])
+                for column in ('L', 'M', 'S')
+            ])
+            lms.flags.writeable = False
+
+            lms_arrays[measurement_type][gender] = (first_month, lms)
+
+    return lms_arrays
+
+
+def build_height_lms_arrays(tables):
+    """
+    Build dense per-sex L/M/S arrays for the weight-for-length/height tables,
+    one row per 0.1 cm from the first tabulated length, so the row for a
+    length is (length - first_length) / HEIGHT_STEP_CM.
+
+    Returns:
+        Dict of indicator -> sex -> (first_length_cm, read-only (n_rows, 3) L/M/S array)
+    """
+    lms_arrays = {}
+
+    for measurement_type in ('weight_for_length', 'weight_for_height'):
+        lms_arrays[measurement_type] = {}
+
+        for gender in GENDERS:
+            if (measurement_type, gender) not in tables:
+                continue
+
+            index_values, values = tables[(measurement_type, gender)]
+            first_length = float(index_values[0])
+            n_rows = int(round((index_values[-1] - first_length) / HEIGHT_STEP_CM)) + 1
+            dense_lengths = first_length + np.arange(n_rows) * HEIGHT_STEP_CM
+
+            # The WHO files have a row every 0.1 cm; interpolation only matters if one is missing
+            lms = np.column_stack([np.interp(dense_lengths, index_values, values[:, i]) for i in range(3)])
+            lms.flags.writeable = False
+
+            lms_arrays[measurement_type][gender] = (first_length, lms)
+
+    return lms_arrays
+
+
+class WHOReferenceRegistry:
+    """
+    Read-only WHO reference data loaded once per process and shared by every
+    WHO_ZScoreCalculator. Load it before forking (the API server does so at
+    import) and worker processes share the pages copy-on-write.
+    """
+
+    def __init__(self, who_folder=WHO_STANDARD_DIR):
+        self.who_folder = who_folder
+        self.fallback_who_reference = _freeze(FALLBACK_WHO_REFERENCE)
+        self.tables = {}
+
+        try:
+            self.tables = load_reference_tables(who_folder)
+            who_reference = tables_to_reference_dict(self.tables)
+
+            # If no Excel files were loaded, use fallback data
+            if not any(who_reference[measurement_type][gender]
+                       for measurement_type in who_reference
+                       for gender in GENDERS):
+                print("No WHO Excel files found, using fallback data")
+                who_reference = FALLBACK_WHO_REFERENCE
+
+        except Exception as e:
+            print(f"Error loading WHO reference data: {e}")
+            print("Using fallback reference data")
+            who_reference = FALLBACK_WHO_REFERENCE
+
+        for _, values in self.tables.values():
+            values.flags.writeable = False
+
+        self.who_reference = _freeze(who_reference)
+        self.lms_arrays = build_lms_arrays(self.who_reference)
+        self.height_lms_arrays = build_height_lms_arrays(self.tables)
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def get_reference_registry(who_folder=WHO_STANDARD_DIR):
+    """
+    Return the shared registry for a WHO folder, loading it on first use
+    """
+    registry = _registries.get(who_folder)
+    if registry is None:
+        with _registry_lock:
+            registry = _registries.get(who_folder)
+            if registry is None:
+                registry = WHOReferenceRegistry(who_folder)
+                _registries[who_folder] = registry
+    return registry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile WHO growth standard tables into a binary cache")
+    parser.add_argument('--who-folder', default=WHO_STANDARD_DIR, help="Folder containing the WHO Excel files")
+    args = parser.parse_args()
+
+    compiled = compile_reference_tables(args.who_folder)
+    print(f"Compiled {len(compiled)} WHO reference tables")
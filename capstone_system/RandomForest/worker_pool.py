@@ -0,0 +1,112 @@
+"""
+Assessment Worker Pool
+Runs CPU-bound assessment, prediction and treatment planning work off the
+asyncio event loop, with a bounded queue so overload is rejected early instead
+of stalling every connection
+"""
+
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+EXECUTOR_KINDS = ('thread', 'process')
+
+
+class WorkerPoolSaturated(Exception):
+    """Raised when the pool already holds as many tasks as it accepts"""
+
+
+class AssessmentWorkerPool:
+    """
+    Thread or process pool with a bounded number of in-flight tasks
+
+    At most max_workers tasks run at once and up to queue_limit more wait for a
+    worker; submitting beyond that raises WorkerPoolSaturated. A process pool
+    needs module-level functions and picklable arguments; its workers are forked
+    from the (already initialized) parent where the platform allows it.
+    """
+
+    def __init__(self, kind='thread', max_workers=None, queue_limit=None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Executor kind must be one of {EXECUTOR_KINDS}, got '{kind}'")
+
+        self.kind = kind
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.queue_limit = self.max_workers * 4 if queue_limit is None else queue_limit
+
+        if kind == 'process':
+            context = multiprocessing.get_context(
+                'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+            )
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='assessment')
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool from ASSESSMENT_EXECUTOR, ASSESSMENT_WORKERS and ASSESSMENT_QUEUE_LIMIT"""
+        workers = os.getenv("ASSESSMENT_WORKERS")
+        queue_limit = os.getenv("ASSESSMENT_QUEUE_LIMIT")
+
+        return cls(
+            kind=os.getenv("ASSESSMENT_EXECUTOR", "thread").lower(),
+            max_workers=int(workers) if workers else None,
+            queue_limit=int(queue_limit) if queue_limit else None
+        )
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.queue_limit:
+                self._rejected += 1
+                raise WorkerPoolSaturated(
+                    f"Assessment queue is full ({self._in_flight} tasks in flight)"
+                )
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        # Count the task until the worker finishes it, even if the caller stops waiting
+        future.add_done_callback(self._task_done)
+        return await asyncio.wrap_future(future)
+
+    def _task_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def stats(self):
+        """Current load: tasks running, tasks waiting for a worker, and totals"""
+        with self._lock:
+            in_flight = self._in_flight
+            return {
+                'executor': self.kind,
+                'max_workers': self.max_workers,
+                'queue_limit': self.queue_limit,
+                'in_flight': in_flight,
+                'running': min(in_flight, self.max_workers),
+                'queue_depth': max(0, in_flight - self.max_workers),
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected
+            }
+
+    def shutdown(self, wait=True):
+        """Stop accepting work and release the workers"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)